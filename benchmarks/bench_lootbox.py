@@ -0,0 +1,229 @@
+"""Reproducible benchmarks for the simulator hot paths
+
+Run from the repository root:
+
+    python benchmarks/bench_lootbox.py --output bench.json
+    python benchmarks/bench_lootbox.py --compare bench.json
+
+Every benchmark uses a fixed seed. Results are written as JSON with
+throughput (ops/second) and peak traced allocation per op, and --compare
+reports the ratio against an earlier run, flagging regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import types
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lootbox_model import LootBox  # noqa: E402
+
+SEED = 12345
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+
+class _Null:
+    """Stand-in for any Streamlit element: callable, a context manager, and chainable"""
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __getattr__(self, name):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class _SessionState(dict):
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+def _cache_data(func=None, **kwargs):
+    """Memoizing stand-in for st.cache_data, keyed on the repr of the arguments"""
+    def decorate(func):
+        cache = {}
+
+        def wrapper(*args):
+            key = repr(args)
+            if key not in cache:
+                cache[key] = func(*args)
+            return cache[key]
+        return wrapper
+    return decorate(func) if func is not None else decorate
+
+
+def stub_streamlit():
+    """Install a no-op streamlit module so UI functions can be timed without a server
+
+    Only the widget-building Python code is measured; nothing is rendered.
+    """
+    null = _Null()
+    module = types.ModuleType("streamlit")
+    module.__getattr__ = lambda name: null
+    module.columns = lambda spec, **kwargs: [null] * (spec if isinstance(spec, int) else len(spec))
+    module.tabs = lambda labels: [null] * len(labels)
+    module.cache_data = _cache_data
+    module.session_state = _SessionState()
+    sys.modules["streamlit"] = module
+    return module
+
+
+def measure(func, ops, repeat):
+    """Time func() repeat times and trace its peak allocation once; func performs ops operations"""
+    func()  # warm up caches and lazy compilation
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    return {
+        "ops": ops,
+        "repeat": repeat,
+        "seconds_min": best,
+        "seconds_median": statistics.median(timings),
+        "ops_per_second": ops / best if best > 0 else float("inf"),
+        "peak_bytes_per_op": peak / ops,
+    }
+
+
+def model_benchmarks(quick=False):
+    """Yield (name, func, ops, repeat) for the model hot paths"""
+    yield "LootBox()", lambda: [LootBox(seed=SEED) for _ in range(1000)], 1000, 5
+
+    loot_box = LootBox(seed=SEED)
+    yield "get_item_from_slot", lambda: [loot_box.get_item_from_slot(0) for _ in range(10_000)], 10_000, 5
+    yield "open_box", lambda: [loot_box.open_box() for _ in range(10_000)], 10_000, 5
+
+    sizes = (1_000, 100_000) if quick else (1_000, 100_000, 1_000_000)
+    for size in sizes:
+        repeat = 3 if size >= 1_000_000 else 5
+        yield (f"open_multiple_boxes[{size:.0e}]",
+               lambda size=size: LootBox(seed=SEED).open_multiple_boxes(size), size, repeat)
+        yield (f"open_boxes_batch[{size:.0e}]",
+               lambda size=size: LootBox(seed=SEED).open_boxes_batch(size), size, repeat)
+
+    stats_box = LootBox(seed=SEED)
+    stats_box.open_boxes_batch(1000)
+
+    def uncached_stats():
+        for _ in range(10_000):
+            stats_box.state_version += 1
+            stats_box.get_collection_stats()
+
+    yield "get_collection_stats[cached]", lambda: [stats_box.get_collection_stats() for _ in range(10_000)], 10_000, 5
+    yield "get_collection_stats[uncached]", uncached_stats, 10_000, 5
+
+
+def ui_benchmarks():
+    """Yield (name, func, ops, repeat) for lootbox_ui rendering against stubbed streamlit"""
+    st = stub_streamlit()
+    import lootbox_ui
+
+    loot_box = LootBox(seed=SEED)
+    loot_box.open_boxes_batch(1000)
+    st.session_state.loot_box = loot_box
+    st.session_state.summary_message = "benchmark"
+    st.session_state.last_rewards = [reward for _ in range(10) for reward in loot_box.open_box()]
+
+    renders = {
+        "display_rewards": lambda: lootbox_ui.display_rewards(),
+        "display_inventory_stats": lambda: lootbox_ui.display_inventory_stats(loot_box),
+        "display_currency_status": lambda: lootbox_ui.display_currency_status(loot_box),
+        "display_drop_rates": lambda: lootbox_ui.display_drop_rates(loot_box),
+        "display_collection_details": lambda: lootbox_ui.display_collection_details(loot_box),
+        "display_collection_grid": lambda: lootbox_ui.display_collection_grid(loot_box),
+    }
+    for name, render in renders.items():
+        yield f"ui.{name}", lambda render=render: [render() for _ in range(100)], 100, 5
+
+
+def run(quick=False, include_ui=True, only=None):
+    results = {}
+    suites = [model_benchmarks(quick)]
+    if include_ui:
+        suites.append(ui_benchmarks())
+    for suite in suites:
+        for name, func, ops, repeat in suite:
+            if only and only not in name:
+                continue
+            results[name] = measure(func, ops, repeat)
+            print(f"{name:40s} {results[name]['ops_per_second']:>14,.0f} ops/s "
+                  f"{results[name]['peak_bytes_per_op']:>12,.1f} B/op", flush=True)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": SEED,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Print throughput ratios against a baseline run and return the names that regressed"""
+    regressions = []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        ratio = result["ops_per_second"] / previous["ops_per_second"]
+        flag = ""
+        if ratio < 1 - threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:40s} {ratio:8.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="compare against a previous JSON result file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="fractional slowdown reported as a regression (default: %(default)s)")
+    parser.add_argument("--quick", action="store_true", help="skip the 1e6-box runs")
+    parser.add_argument("--no-ui", action="store_true", help="skip the lootbox_ui rendering benchmarks")
+    parser.add_argument("--only", help="run only benchmarks whose name contains this string")
+    args = parser.parse_args(argv)
+
+    current = run(quick=args.quick, include_ui=not args.no_ui, only=args.only)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
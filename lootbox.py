@@ -0,0 +1,405 @@
+"""Headless loot box simulator: python -m lootbox <command> [options]
+
+Commands:
+
+    open       open boxes for one player, optionally resuming a snapshot
+    simulate   Monte Carlo statistics over many independent players
+    estimate   simulate until chosen metrics reach a target precision
+    sweep      compare config variants with common random numbers
+    analyze    exact completion and currency analytics, no sampling
+    economy    multi-currency earn/spend loop over days of play
+    serve      local HTTP service for per-player boxes and simulations
+
+Results are written as JSON (default), CSV or Parquet to --output or stdout.
+Only argparse and json are imported at startup; each command loads the model
+modules it needs, and nothing here imports streamlit.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+FORMATS = ("json", "csv", "parquet")
+
+
+def _json_default(value):
+    # NumPy scalars and arrays
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def flatten(data, prefix=""):
+    """Flatten nested dicts and sequences into one dict with dotted keys"""
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, (list, tuple)):
+        items = enumerate(data)
+    else:
+        return {prefix: data}
+    flat = {}
+    for key, value in items:
+        flat.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def write_output(result, rows, format, path=None):
+    """Write a result as nested JSON, or its flat rows as CSV or Parquet"""
+    if format == "json":
+        text = json.dumps(result, indent=2, default=_json_default) + "\n"
+        if path:
+            with open(path, "w") as f:
+                f.write(text)
+        else:
+            sys.stdout.write(text)
+        return
+
+    rows = [flatten(row) for row in rows]
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    if format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist([{column: row.get(column) for column in columns} for row in rows])
+        pq.write_table(table, path)
+        return
+
+    f = open(path, "w", newline="") if path else sys.stdout
+    try:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if path:
+            f.close()
+
+
+def parse_path(text):
+    """Parse a dotted config path such as "slot1.Pets T1" or "item_properties.Emote T1.duplicate_currency"
+
+    slotN.<item> addresses slot N's drop rate, as labelled in sweep results.
+    """
+    head, _, rest = text.partition(".")
+    if head.startswith("slot") and head[4:].isdigit():
+        return ("slot_loot_tables", int(head[4:]) - 1, rest)
+    keys = text.split(".")
+    if keys[0] not in ("unique_items", "item_properties", "drop_mode"):
+        keys.insert(0, "item_properties" if len(keys) > 1 else "unique_items")
+    return tuple(keys)
+
+
+def _parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _parse_axis(text):
+    path, separator, values = text.partition("=")
+    if not separator or not values:
+        raise argparse.ArgumentTypeError(f"expected PATH=VALUE[,VALUE...], got {text!r}")
+    return parse_path(path), [_parse_value(value) for value in values.split(",")]
+
+
+def _positive_int(text):
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {text!r}")
+    return value
+
+
+def _parse_boost(text):
+    item, separator, factor = text.rpartition("=")
+    try:
+        if separator and item:
+            return item, float(factor)
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"expected ITEM=FACTOR, got {text!r}")
+
+
+def cmd_open(args):
+    from lootbox_model import LootBox
+
+    if args.snapshot and os.path.exists(args.snapshot):
+        from lootbox_checkpoint import load_snapshot
+
+        loot_box = load_snapshot(args.snapshot, args.config)
+    else:
+        loot_box = LootBox(args.config, seed=args.seed)
+
+    if args.total is not None:
+        boxes = max(0, args.total - loot_box.boxes_opened)
+    else:
+        boxes = args.boxes
+
+    if args.events:
+        summary = loot_box.log_open_boxes(boxes, args.events)
+        if args.snapshot:
+            from lootbox_checkpoint import save_snapshot
+
+            save_snapshot(loot_box, args.snapshot)
+    elif args.snapshot:
+        from lootbox_checkpoint import run_checkpointed
+
+        # run_checkpointed writes the final snapshot itself
+        snapshot = loot_box.counter_snapshot()
+        loot_box = run_checkpointed(loot_box, args.snapshot, loot_box.boxes_opened + boxes,
+                                    every=args.checkpoint_every)
+        summary = loot_box.summary_since(snapshot, boxes)
+    else:
+        summary = loot_box.open_boxes_batch(boxes)
+
+    result = {
+        "config_hash": loot_box.config.content_hash,
+        "summary": summary,
+        "stats": loot_box.get_collection_stats(),
+    }
+    return result, [result]
+
+
+def cmd_simulate(args):
+    from lootbox_sim import simulate
+
+    result = simulate(args.config, players=args.players, boxes_per_player=args.boxes,
+                      workers=args.workers, seed=args.seed, quantiles=args.quantiles)
+    del result["aggregates"]
+    rows = [{"metric": metric, **result[metric]} for metric in ("currency", "duplicates")]
+    rows += [{"metric": f"completion.{item_type}", **stats} for item_type, stats in result["completion"].items()]
+    return result, rows
+
+
+def cmd_sweep(args):
+    from lootbox_sweep import comparison_table, grid, sweep
+
+    variants = {}
+    if args.variants:
+        with open(args.variants) as f:
+            variants.update(json.load(f))
+    if args.set:
+        variants.update(grid(dict(args.set)))
+    results = sweep(args.config, variants, players=args.players, boxes_per_player=args.boxes,
+                    workers=args.workers, seed=args.seed, confidence=args.confidence,
+                    completion_quantiles=args.quantiles, target_precision=args.target_precision,
+                    max_players=args.max_players, max_boxes=args.max_boxes)
+
+    # Split (low, high) interval tuples into their own columns
+    rows = []
+    for row in comparison_table(results, args.categories):
+        flat = {}
+        for key, value in row.items():
+            if key.endswith("_ci"):
+                flat[f"{key}_low"], flat[f"{key}_high"] = value or (None, None)
+            else:
+                flat[key] = value
+        rows.append(flat)
+    return results, rows
+
+
+def cmd_estimate(args):
+    from lootbox_adaptive import simulate_adaptive
+
+    result = simulate_adaptive(args.config, metrics=args.metrics, target_precision=args.target_precision,
+                               confidence=args.confidence, boxes_per_player=args.boxes, min_batches=args.min_batches,
+                               max_players=args.max_players, max_boxes=args.max_boxes, workers=args.workers,
+                               seed=args.seed, importance=dict(args.importance or ()), stratified=args.stratified,
+                               control_variates=args.control_variates)
+    rows = [{"metric": name, **estimate} for name, estimate in result["metrics"].items()]
+    return result, rows
+
+
+def cmd_analyze(args):
+    import lootbox_analysis as analysis
+    from lootbox_model import LootBox
+
+    loot_box = LootBox(args.config)
+    report = analysis.completion_report(loot_box, args.percentiles)
+    result = {
+        "config_hash": loot_box.config.content_hash,
+        "expected_currency_per_box": analysis.expected_currency_per_box(loot_box),
+        "completion": report,
+        "after_boxes": {},
+    }
+    rows = [
+        {"item": item_type, "total": entry["total"], "expected_boxes": entry["expected_boxes"],
+         **{f"p{round(q * 100)}_boxes": boxes for q, boxes in entry["percentiles"].items()}}
+        for item_type, entry in report.items()
+    ]
+
+    for boxes in args.boxes:
+        distributions = analysis.collection_distributions(loot_box, boxes)
+        after = {"expected_currency": analysis.expected_currency(loot_box, boxes), "items": {}}
+        for item, histograms in distributions.items():
+            after["items"][item] = {
+                name: {
+                    "mean": histogram.mean(),
+                    **{f"p{round(q * 100)}": histogram.quantile(q) for q in args.percentiles},
+                    **({"values": histogram.values, "probabilities": histogram.probabilities}
+                       if args.histograms else {}),
+                }
+                for name, histogram in histograms.items()
+            }
+            if "collected" in histograms:
+                rows.append({"item": item, "boxes": boxes,
+                             **flatten({key: value for key, value in after["items"][item]["collected"].items()
+                                        if key not in ("values", "probabilities")}, "collected")})
+        result["after_boxes"][boxes] = after
+    return result, rows
+
+
+def cmd_economy(args):
+    from lootbox_economy import simulate_economy
+
+    result = simulate_economy(args.config, players=args.players, days=args.days, boxes_per_day=args.boxes_per_day,
+                              seed=args.seed, craft=not args.no_crafting)
+    return result, result["daily"]
+
+
+def cmd_serve(args):
+    from lootbox_service import serve
+
+    serve(args.host, args.port, config=args.config, capacity=args.capacity, snapshot_dir=args.snapshot_dir,
+          seed=args.seed, workers=args.workers, max_delay=args.max_delay / 1000)
+    return None, None
+
+
+def _add_common(parser):
+    parser.add_argument("--config", help="config file (JSON or TOML); default configs/default.json")
+    parser.add_argument("--format", choices=FORMATS, default="json", help="output format (default: json)")
+    parser.add_argument("--output", "-o", help="write results here instead of stdout (required for parquet)")
+
+
+def _add_population(parser):
+    parser.add_argument("--seed", type=int, help="seed for reproducible results")
+    parser.add_argument("--players", type=_positive_int, default=1000, help="players to simulate (default: %(default)s)")
+    parser.add_argument("--boxes", type=_positive_int, default=100, help="boxes per player (default: %(default)s)")
+    parser.add_argument("--workers", type=_positive_int, help="worker processes (default: one per CPU)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m lootbox", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    open_parser = commands.add_parser("open", help="open boxes for one player")
+    _add_common(open_parser)
+    open_parser.add_argument("--seed", type=int, help="seed for a new player")
+    count = open_parser.add_mutually_exclusive_group()
+    count.add_argument("--boxes", type=_positive_int, default=1, help="boxes to open (default: %(default)s)")
+    count.add_argument("--total", type=_positive_int, help="open boxes until the player has opened this many in total")
+    open_parser.add_argument("--snapshot", help="resume from this snapshot if it exists and save back to it")
+    open_parser.add_argument("--checkpoint-every", type=_positive_int, default=1_000_000,
+                             help="boxes between snapshot checkpoints (default: %(default)s)")
+    open_parser.add_argument("--events", help="stream every reward event to this log (Parquet or .npy directory)")
+    open_parser.set_defaults(func=cmd_open)
+
+    simulate_parser = commands.add_parser("simulate", help="simulate many independent players")
+    _add_common(simulate_parser)
+    _add_population(simulate_parser)
+    simulate_parser.add_argument("--quantiles", type=float, nargs="+",
+                                 default=[0.05, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99])
+    simulate_parser.set_defaults(func=cmd_simulate)
+
+    sweep_parser = commands.add_parser("sweep", help="compare config variants against the base config")
+    _add_common(sweep_parser)
+    _add_population(sweep_parser)
+    sweep_parser.add_argument("--variants", help="JSON file of {name: overrides}")
+    sweep_parser.add_argument("--set", type=_parse_axis, action="append", metavar="PATH=V1,V2",
+                              help='grid axis, e.g. "slot1.Pets T1=25,30"; repeat for more axes')
+    sweep_parser.add_argument("--confidence", type=float, default=0.95)
+    sweep_parser.add_argument("--quantiles", type=float, nargs="+", default=[0.5, 0.9],
+                              help="boxes-to-complete quantiles (default: 0.5 0.9)")
+    sweep_parser.add_argument("--categories", nargs="+", help="limit completion columns to these categories")
+    sweep_parser.add_argument("--target-precision", type=float,
+                              help="treat --players as a first round and add players until every CI half-width "
+                                   "is within this fraction of its estimate")
+    sweep_parser.add_argument("--max-players", type=_positive_int, default=1_000_000,
+                              help="player cap with --target-precision (default: %(default)s)")
+    sweep_parser.add_argument("--max-boxes", type=_positive_int, default=20_000,
+                              help="follow players until every category is complete or this many boxes; "
+                                   "completion quantiles past it are censored (default: %(default)s)")
+    sweep_parser.set_defaults(func=cmd_sweep)
+
+    estimate_parser = commands.add_parser("estimate", help="simulate until metrics reach a target precision")
+    _add_common(estimate_parser)
+    estimate_parser.add_argument("metrics", nargs="*", default=["currency_per_box", "duplicates_per_box"],
+                                 help='currency_per_box, duplicates_per_box, or for an item "<item> mean", '
+                                      '"<item> p<N>", "<item> first mean", "<item> first p<N>", '
+                                      '"<item> collected" or "<item> completed" '
+                                      '(default: currency_per_box duplicates_per_box)')
+    estimate_parser.add_argument("--target-precision", type=float, default=0.01,
+                                 help="stop when every CI half-width is within this fraction of its estimate "
+                                      "(default: %(default)s)")
+    estimate_parser.add_argument("--confidence", type=float, default=0.95)
+    estimate_parser.add_argument("--boxes", type=_positive_int, default=100,
+                                 help="boxes per player for per-box metrics (default: %(default)s)")
+    estimate_parser.add_argument("--min-batches", type=_positive_int, default=10,
+                                 help="batches before quantile intervals are trusted (default: %(default)s)")
+    estimate_parser.add_argument("--max-players", type=_positive_int, default=1_000_000)
+    estimate_parser.add_argument("--max-boxes", type=_positive_int, default=20_000,
+                                 help="boxes after which completion is censored (default: %(default)s)")
+    estimate_parser.add_argument("--importance", type=_parse_boost, action="append", metavar="ITEM=FACTOR",
+                                 help="importance-sample rare drops: boost ITEM's rate by FACTOR and reweight "
+                                      "players; horizon metrics only (repeatable)")
+    estimate_parser.add_argument("--stratified", action="store_true",
+                                 help="draw slot outcomes with stratified uniforms across each batch")
+    estimate_parser.add_argument("--control-variates", action="store_true",
+                                 help="adjust means by natural draw counts, whose expectations are known")
+    estimate_parser.add_argument("--seed", type=int, help="seed for reproducible results")
+    estimate_parser.add_argument("--workers", type=_positive_int, help="worker processes (default: one per CPU)")
+    estimate_parser.set_defaults(func=cmd_estimate)
+
+    analyze_parser = commands.add_parser("analyze", help="exact analytics for a config")
+    _add_common(analyze_parser)
+    analyze_parser.add_argument("--boxes", type=_positive_int, nargs="*", default=[],
+                                help="also report exact distributions after these box counts")
+    analyze_parser.add_argument("--percentiles", type=float, nargs="+", default=[0.5, 0.9, 0.99])
+    analyze_parser.add_argument("--histograms", action="store_true",
+                                help="include full histograms in JSON output")
+    analyze_parser.set_defaults(func=cmd_analyze)
+
+    economy_parser = commands.add_parser("economy", help="simulate currency earn/spend loops over days of play")
+    _add_common(economy_parser)
+    economy_parser.add_argument("--seed", type=int, help="seed for reproducible results")
+    economy_parser.add_argument("--players", type=_positive_int, default=1000, help="players to simulate (default: %(default)s)")
+    economy_parser.add_argument("--days", type=_positive_int, default=90, help="days of play (default: %(default)s)")
+    economy_parser.add_argument("--boxes-per-day", type=_positive_int, default=3, help="boxes per player per day (default: %(default)s)")
+    economy_parser.add_argument("--no-crafting", action="store_true", help="never spend currency on crafting")
+    economy_parser.set_defaults(func=cmd_economy)
+
+    serve_parser = commands.add_parser("serve", help="run the local simulation service")
+    serve_parser.add_argument("--config", help="config file (JSON or TOML); default configs/default.json")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--seed", type=int, help="derive each new player's seed from this and their id")
+    serve_parser.add_argument("--capacity", type=_positive_int, default=10_000,
+                              help="players kept in memory (default: %(default)s)")
+    serve_parser.add_argument("--snapshot-dir", help="save evicted players here and reload them on demand")
+    serve_parser.add_argument("--workers", type=_positive_int, help="simulation worker processes (default: one per CPU)")
+    serve_parser.add_argument("--max-delay", type=float, default=2.0,
+                              help="milliseconds a single-box request waits to batch (default: %(default)s)")
+    serve_parser.set_defaults(func=cmd_serve, format=None, output=None)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.format == "parquet" and not args.output:
+        parser.error("--format parquet requires --output")
+    try:
+        result, rows = args.func(args)
+    except (ValueError, OSError) as e:
+        parser.exit(2, f"{parser.prog} {args.command}: error: {e}\n")
+    if result is None:
+        return 0
+    write_output(result, rows, args.format, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
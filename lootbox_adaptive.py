@@ -0,0 +1,451 @@
+import copy
+import math
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lootbox_cohort import LootBoxCohort
+from lootbox_config import compile_config, resolve_config
+from lootbox_sim import CHUNK_SIZE, Aggregate, z_score
+
+DEFAULT_METRICS = ("currency_per_box", "duplicates_per_box")
+DEFAULT_TARGET_PRECISION = 0.01
+# Batch means need enough batches for their spread to be a usable standard error
+DEFAULT_MIN_BATCHES = 10
+DEFAULT_MAX_PLAYERS = 1_000_000
+# Completion runs stop here; players still incomplete are censored at max_boxes + 1
+DEFAULT_MAX_BOXES = 20_000
+
+PER_BOX_METRICS = ("currency_per_box", "duplicates_per_box")
+# Metrics read at boxes_per_player; the others follow each player until an event
+HORIZON_KINDS = ("per_box", "collected", "completed")
+_ITEM_METRIC = re.compile(r"^(?P<item>.+?) (?:(?P<count>collected|completed)|"
+                          r"(?P<first>first )?(?:p(?P<percent>\d+(?:\.\d+)?)|(?P<mean>mean)))$")
+
+# kind: "per_box", "collected" (mean collected at the horizon), "completed"
+# (probability of completing by the horizon), "completion" (boxes to complete)
+# or "first" (boxes to the first drop). q is the quantile, None for means.
+Metric = namedtuple("Metric", ["name", "kind", "item", "q"])
+
+
+def parse_metric(name, config):
+    """Parse a metric name into a Metric
+
+    Names are "currency_per_box", "duplicates_per_box", or for a category:
+
+        "<item> mean", "<item> p<percent>"              boxes to complete it
+        "<item> first mean", "<item> first p<percent>"  boxes to its first drop
+        "<item> collected"                            items collected by the horizon
+        "<item> completed"                            chance of completing by the horizon
+
+    Completion names match the completion columns of sweep comparison tables
+    (e.g. "Chess Set: T1 p90").
+    """
+    if name in PER_BOX_METRICS:
+        return Metric(name, "per_box", None, None)
+    match = _ITEM_METRIC.match(name)
+    if match is None or config.unique_item_totals.get(match["item"], 0) == 0:
+        raise ValueError(f"Unknown metric: {name!r}")
+    if match["count"]:
+        return Metric(name, match["count"], match["item"], None)
+    kind = "first" if match["first"] else "completion"
+    if match["mean"]:
+        return Metric(name, kind, match["item"], None)
+    q = float(match["percent"]) / 100
+    if not 0 < q < 1:
+        raise ValueError(f"Metric {name!r} percentile must be between 0 and 100")
+    return Metric(name, kind, match["item"], q)
+
+
+def relative_precision(estimate, low, high):
+    """Half-width of a confidence interval relative to its estimate; inf if undefined"""
+    if estimate is None or low is None or high is None or estimate == 0:
+        return math.inf
+    return (high - low) / 2 / abs(estimate)
+
+
+def next_round(done, worst, target, batch_size=1, limit=None):
+    """Return how many more samples to run after done samples reached relative precision worst
+
+    Precision scales with 1 / sqrt(samples), so the projection is
+    done * (worst / target)^2 with a 10% margin. Rounds at least add one
+    batch and at most double the total, rounded up to whole batches.
+    """
+    needed = done * (worst / target) ** 2 * 1.1 if math.isfinite(worst) else 2 * done
+    more = min(max(needed - done, batch_size), done)
+    more = math.ceil(more / batch_size) * batch_size
+    if limit is not None:
+        more = min(more, limit - done)
+    return max(int(more), 0)
+
+
+class Moments:
+    """Running count, mean vector and co-moment matrix of vector samples
+
+    Batches combine with Chan et al.'s pairwise update, which reduces to
+    Welford's for single samples, so no sums of squares lose precision. Used
+    for per-player metric columns (with control variates alongside) and for
+    batch means, where each independent batch contributes one estimate and the
+    mean of k of them has standard error sd / sqrt(k) whatever the dependence
+    between players within a batch.
+    """
+
+    def __init__(self, dimension=1):
+        self.count = 0
+        self.mean = np.zeros(dimension)
+        self.m2 = np.zeros((dimension, dimension))
+
+    def add(self, samples):
+        """Add a (samples, dimension) array, or one sample"""
+        samples = np.asarray(samples, dtype=np.float64).reshape(-1, len(self.mean))
+        other = Moments(len(self.mean))
+        other.count = len(samples)
+        if other.count:
+            other.mean = samples.mean(axis=0)
+            centered = samples - other.mean
+            other.m2 = centered.T @ centered
+        return self.merge(other)
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 = self.m2 + other.m2 + np.outer(delta, delta) * (self.count * other.count / count)
+        self.mean = self.mean + delta * (other.count / count)
+        self.count = count
+        return self
+
+    def covariance(self):
+        if self.count < 2:
+            return np.full_like(self.m2, math.inf)
+        return self.m2 / (self.count - 1)
+
+    def standard_error(self):
+        """Standard error of the mean of the first column"""
+        return math.sqrt(self.covariance()[0, 0] / self.count) if self.count >= 2 else math.inf
+
+
+def proposal_config(config, importance):
+    """Return config with each item's rate multiplied by its factor in every slot that drops it
+
+    importance maps items to factors; the other entries of each slot are
+    rescaled to keep it at 100% (see lootbox_sweep.set_path). Used as the
+    sampling distribution for importance sampling of rare drops.
+    """
+    from lootbox_sweep import set_path
+
+    data = copy.deepcopy(config.to_dict())
+    for item, factor in importance.items():
+        if item not in config.category_ids:
+            raise ValueError(f"Unknown item: {item}")
+        if factor <= 0:
+            raise ValueError(f"Importance factor for {item} must be positive")
+        for slot_index, loot_table in enumerate(data["slot_loot_tables"]):
+            rate = loot_table.get(item, 0)
+            if rate <= 0:
+                continue
+            if rate * factor >= 100:
+                raise ValueError(f"Importance factor for {item} takes slot {slot_index+1} to 100% or more")
+            set_path(data, ("slot_loot_tables", slot_index, item), rate * factor)
+    return compile_config(data)
+
+
+def _control_means(config, boxes_per_player):
+    """Expected natural draws per category over boxes_per_player boxes, for categories that can drop"""
+    from lootbox_analysis import slot_rates
+    from lootbox_model import LootBox
+
+    loot_box = LootBox(config)
+    means = np.array([boxes_per_player * sum(slot_rates(loot_box, item)) for item in config.categories])
+    categories = np.flatnonzero(means > 0)
+    return categories, means[categories]
+
+
+def _run_batch(config, proposal, players, boxes_per_player, metrics, controls, max_boxes, stratified,
+               seed_sequence):
+    """Simulate one batch of players as a cohort
+
+    Horizon metrics are read after boxes_per_player boxes; completion and
+    first-drop metrics follow each player (up to max_boxes) until the event,
+    censoring players who never reach it at max_boxes + 1. With a proposal
+    config the cohort samples from it and horizon metrics are weighted by each
+    player's likelihood ratio at the horizon.
+
+    Returns Moments of the mean metric columns, horizon and event metrics
+    separately, each followed by the natural-draw controls (and the weight
+    itself under importance sampling), Aggregates of each quantile metric and
+    the mean metrics that were censored.
+    """
+    cohort = LootBoxCohort(players, proposal or config, seed=seed_sequence, stratified=stratified)
+    if proposal is not None or controls is not None:
+        cohort.track_draws(nominal=None if proposal is None else config)
+
+    event_metrics = [metric for metric in metrics if metric.kind not in HORIZON_KINDS]
+    category_ids = [config.category_ids[metric.item] for metric in event_metrics]
+    # Completion compares the collected count with the total, a first drop with 1
+    targets = np.array([config.totals[category_id] if metric.kind == "completion" else 1
+                        for metric, category_id in zip(event_metrics, category_ids)], dtype=np.int64)
+    reached_at = np.full((players, len(event_metrics)), max_boxes + 1, dtype=np.int64)
+
+    box = 0
+    while box < max_boxes:
+        if box < boxes_per_player:
+            cohort.open_boxes(1)
+        else:
+            pending = np.flatnonzero((reached_at > max_boxes).any(axis=1))
+            if pending.size == 0:
+                break
+            cohort.open_boxes(1, rows=pending)
+        box += 1
+        if category_ids:
+            reached = (cohort.collected_counts[:, category_ids] >= targets) & (reached_at > max_boxes)
+            reached_at[reached] = box
+        if box == boxes_per_player:
+            horizon = {
+                "currency_per_box": cohort.currency / boxes_per_player,
+                "duplicates_per_box": cohort.duplicates / boxes_per_player,
+                "collected_counts": cohort.collected_counts.copy(),
+                "natural_draws": None if cohort.natural_draws is None else cohort.natural_draws.copy(),
+                "log_weights": None if cohort.log_weights is None else cohort.log_weights.copy(),
+            }
+            if not category_ids:
+                break
+
+    def values(metric):
+        if metric.kind == "per_box":
+            return horizon[metric.name]
+        category_id = config.category_ids[metric.item]
+        collected = horizon["collected_counts"][:, category_id]
+        if metric.kind == "collected":
+            return collected
+        if metric.kind == "completed":
+            return collected == config.totals[category_id]
+        return reached_at[:, event_metrics.index(metric)]
+
+    ones = np.ones(players)
+    weight = ones if proposal is None else np.exp(horizon["log_weights"])
+    # Importance sampling only covers horizon metrics, so event metrics are unweighted
+    weights = {"horizon": weight, "final": ones}
+    result = {"groups": {}, "quantiles": {}, "censored": set(),
+              "weight_sums": (weight.sum(), np.square(weight).sum())}
+    for group, group_weight in weights.items():
+        columns = [group_weight * values(metric) for metric in metrics
+                   if metric.q is None and (metric.kind in HORIZON_KINDS) == (group == "horizon")]
+        if not columns:
+            continue
+        if controls is not None:
+            columns += list(group_weight * horizon["natural_draws"][:, controls].T)
+        if proposal is not None and group == "horizon":
+            columns.append(group_weight)
+        result["groups"][group] = Moments(len(columns)).add(np.column_stack(columns))
+
+    for metric in metrics:
+        if metric.kind in HORIZON_KINDS:
+            continue
+        samples = values(metric)
+        if samples.max() > max_boxes:
+            result["censored"].add(metric.name)
+        if metric.q is not None:
+            result["quantiles"][metric.name] = Aggregate().add(samples)
+    return result
+
+
+def _mean_estimate(index, moments, batch_means, control_means, batched, z):
+    """Return (estimate, low, high) for mean column index, adjusted by any control columns
+
+    Controls are the columns after the metric columns, with known means
+    control_means. The adjustment coefficients minimize the residual variance
+    (ordinary least squares over pooled players). With batched, the standard
+    error comes from batch means of the adjusted column instead of the pooled
+    residual variance: stratified players are dependent within a batch, and
+    the residual variance of controlled or weighted rare events is far too
+    small an estimate when those events are seldom seen.
+    """
+    count = len(control_means)
+    controls = slice(len(moments.mean) - count, None)
+    covariance = moments.covariance()
+    beta = np.zeros(0)
+    if count:
+        beta = np.linalg.pinv(covariance[controls, controls]) @ covariance[controls, index]
+
+    def adjusted(mean):
+        return mean[index] - beta @ (mean[controls] - control_means)
+
+    estimate = float(adjusted(moments.mean))
+    if batched:
+        standard_error = Moments().add([adjusted(mean) for mean in batch_means]).standard_error()
+        # Identical batches mean the rare events driving the error were never seen, not that there is none
+        if standard_error <= 1e-12 * abs(estimate):
+            standard_error = math.inf
+    else:
+        variance = covariance[index, index] - (covariance[controls, index] @ beta if count else 0.0)
+        standard_error = math.sqrt(max(variance, 0.0) / moments.count)
+    return estimate, estimate - z * standard_error, estimate + z * standard_error
+
+
+def simulate_adaptive(config=None, metrics=DEFAULT_METRICS, target_precision=DEFAULT_TARGET_PRECISION,
+                      confidence=0.95, boxes_per_player=100, batch_size=CHUNK_SIZE,
+                      min_batches=DEFAULT_MIN_BATCHES, max_players=DEFAULT_MAX_PLAYERS,
+                      max_boxes=DEFAULT_MAX_BOXES, workers=None, seed=None,
+                      importance=None, stratified=False, control_variates=False):
+    """Simulate players in growing rounds until every metric reaches target_precision
+
+    Horizon metrics (per-box, collected, completed) are read after
+    boxes_per_player boxes; completion and first-drop metrics follow each
+    player until the event. Means get normal intervals from running moments,
+    quantiles from batch means over batches of batch_size players. After each
+    round the run stops once every interval's half-width is within
+    target_precision of its estimate, or at max_players. Each batch draws from
+    its own stream spawned from seed, so results do not depend on the worker
+    count.
+
+    Three variance reduction techniques help with rare drops, alone or together:
+
+    importance: {item: factor} boosts each item's rate by factor in every
+        slot (see proposal_config) and reweights every player by their
+        likelihood ratio, so rare drops are seen often but counted at their
+        true rate. Horizon metrics only: weights compound with every box, so
+        past the horizon they degenerate. Boosts that bring the expected
+        draws of the item to about one per player work well; check
+        effective_players in the result.
+    stratified: draws each step's slot outcomes with stratified uniforms across
+        the batch, so outcome proportions match the rates almost exactly.
+    control_variates: adjusts mean metrics by each player's natural draws per
+        category, whose expectations are known from the drop rates (see
+        lootbox_analysis.slot_rates), removing the part of the noise explained
+        by lucky or unlucky draws.
+
+    With any of them, means also take their intervals from batch means, and a
+    mean whose batches all agree has unknown precision: what is left after
+    the adjustment is driven by rare events, and none have been seen yet.
+    Intervals are only as good as the number of those events, so prefer
+    several hundred thousand players for the rarest metrics.
+    """
+    config = resolve_config(config)
+    parsed = [parse_metric(name, config) for name in metrics]
+    if not parsed:
+        raise ValueError("At least one metric is required")
+    if target_precision <= 0:
+        raise ValueError("target_precision must be positive")
+    if not 0 < boxes_per_player <= max_boxes:
+        raise ValueError("boxes_per_player must be positive and not exceed max_boxes")
+    proposal = None
+    if importance:
+        if any(metric.kind not in HORIZON_KINDS for metric in parsed):
+            raise ValueError("Importance sampling supports horizon metrics only (per-box, collected, completed)")
+        proposal = proposal_config(config, importance)
+    controls = control_means = None
+    if control_variates:
+        controls, control_means = _control_means(config, boxes_per_player)
+    z = z_score(confidence)
+    # Stratified, controlled or weighted means take their standard error from batch means
+    batched = stratified or control_variates or proposal is not None
+
+    seed_sequence = np.random.SeedSequence(seed)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    groups = {}
+    batch_means = {}
+    pooled_quantiles = {}
+    quantile_means = {metric.name: Moments() for metric in parsed if metric.q is not None}
+    censored = set()
+    weight_sum = weight_square_sum = 0.0
+    players = 0
+    rounds = []
+    # Pooled means are usable from the first batch; batch means need min_batches batches
+    more = min((min_batches if quantile_means or batched else 1) * batch_size, max_players)
+    try:
+        while more > 0:
+            sizes = [min(batch_size, more - start) for start in range(0, more, batch_size)]
+            args = [(config, proposal, size, boxes_per_player, parsed, controls, max_boxes, stratified, batch_seed)
+                    for size, batch_seed in zip(sizes, seed_sequence.spawn(len(sizes)))]
+            if executor is None:
+                batches = [_run_batch(*batch_args) for batch_args in args]
+            else:
+                batches = list(executor.map(_run_batch, *zip(*args)))
+
+            for batch in batches:
+                for group, moments in batch["groups"].items():
+                    groups.setdefault(group, Moments(len(moments.mean))).merge(moments)
+                    batch_means.setdefault(group, []).append(moments.mean)
+                for metric in parsed:
+                    if metric.q is None:
+                        continue
+                    aggregate = batch["quantiles"][metric.name]
+                    quantile_means[metric.name].add(aggregate.quantile(metric.q))
+                    if metric.name in pooled_quantiles:
+                        pooled_quantiles[metric.name].merge(aggregate)
+                    else:
+                        pooled_quantiles[metric.name] = aggregate
+                censored |= batch["censored"]
+                weight_sum += batch["weight_sums"][0]
+                weight_square_sum += batch["weight_sums"][1]
+            players += more
+
+            estimates = {}
+            columns = {"horizon": 0, "final": 0}
+            for metric in parsed:
+                group = "horizon" if metric.kind in HORIZON_KINDS else "final"
+                if metric.q is None:
+                    index = columns[group]
+                    columns[group] += 1
+                    if metric.name in censored:
+                        # Censored players would bias the mean
+                        estimates[metric.name] = None, None, None
+                        continue
+                    known = np.zeros(0) if controls is None else control_means
+                    if proposal is not None and group == "horizon":
+                        known = np.append(known, 1.0)
+                    estimates[metric.name] = _mean_estimate(index, groups[group], batch_means[group], known,
+                                                            batched, z)
+                    continue
+                estimate = pooled_quantiles[metric.name].quantile(metric.q)
+                if estimate > max_boxes:
+                    estimates[metric.name] = None, None, None
+                    continue
+                half_width = z * quantile_means[metric.name].standard_error()
+                estimates[metric.name] = estimate, estimate - half_width, estimate + half_width
+            precision = {name: relative_precision(*estimate) for name, estimate in estimates.items()}
+            worst = max(precision.values())
+            rounds.append({"players": players, "worst_relative_precision": worst})
+            # More players cannot help a metric censored at max_boxes
+            if worst <= target_precision or any(estimate[0] is None for estimate in estimates.values()):
+                break
+            more = next_round(players, worst, target_precision, batch_size, max_players)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return {
+        "config_hash": config.content_hash,
+        "seed": seed_sequence.entropy,
+        "players": players,
+        "boxes_per_player": boxes_per_player,
+        "confidence": confidence,
+        "target_precision": target_precision,
+        "converged": worst <= target_precision,
+        "variance_reduction": {
+            "importance": dict(importance or {}),
+            "stratified": stratified,
+            "control_variates": control_variates,
+        },
+        # Kish's effective sample size of the importance weights; equals players without them
+        "effective_players": float(weight_sum ** 2 / weight_square_sum),
+        "metrics": {
+            name: {
+                "estimate": estimate,
+                "low": low,
+                "high": high,
+                "relative_precision": precision[name],
+                "converged": precision[name] <= target_precision,
+            }
+            for name, (estimate, low, high) in estimates.items()
+        },
+        "rounds": rounds,
+    }
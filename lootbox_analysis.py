@@ -0,0 +1,395 @@
+from collections import namedtuple
+
+import numpy as np
+
+from lootbox_pity import biased_threshold_count, new_item_probability
+
+DEFAULT_PERCENTILES = (0.5, 0.9, 0.99)
+
+# Binary lifting stops doubling past this many boxes
+MAX_POWER = 60
+
+# Above this many multiply-adds, pmf convolutions switch from direct to FFT
+DIRECT_CONVOLVE_LIMIT = 10_000_000
+
+
+def slot_rates(loot_box, item):
+    """Return the per-slot probability (0-1) of drawing item"""
+    return [loot_table.get(item, 0.0) / 100 for loot_table in loot_box.slot_loot_tables]
+
+
+def _require_no_guarantees(loot_box):
+    """Raise ValueError for configs with guarantee rules
+
+    A guarantee replaces slot draws depending on how long ago its item last
+    dropped, so boxes stop being independent draws from the slot tables and
+    none of the exact results here hold. Use Monte Carlo (lootbox_sim) instead.
+    """
+    if loot_box.config.guarantee_rules:
+        raise ValueError("Exact analytics do not support guarantee rules; simulate this config instead")
+
+
+def _collected_count(loot_box, item_type, collected):
+    if collected is not None and item_type in collected:
+        return collected[item_type]
+    return len(loot_box.unique_items[item_type]["collected"])
+
+
+def _new_item_probabilities(loot_box, item_type):
+    """Return the probability that one draw of item_type is new, for each collected count 0..total
+
+    Uniform draws give (total - k) / total; a bias rule or the no-duplicates
+    drop mode raises it from the rule's threshold on.
+    """
+    total = loot_box.unique_items[item_type]["total"]
+    states = np.arange(total + 1)
+    probabilities = (total - states) / total
+    rule = loot_box.config.bias_rules.get(loot_box.category_ids[item_type])
+    if rule is not None:
+        biased = states >= biased_threshold_count(rule, total)
+        probabilities[biased] = new_item_probability(rule, states[biased], total)
+    return probabilities
+
+
+def _is_biased(loot_box, item_type):
+    return loot_box.category_ids[item_type] in loot_box.config.bias_rules
+
+
+def draws_per_box(loot_box, item_type):
+    """Return the distribution of how many times item_type is drawn in one box
+
+    Index m of the returned array is the probability of exactly m draws.
+    """
+    _require_no_guarantees(loot_box)
+    pmf = np.array([1.0])
+    for rate in slot_rates(loot_box, item_type):
+        pmf = np.convolve(pmf, [1.0 - rate, rate])
+    return pmf
+
+
+def transition_matrix(loot_box, item_type):
+    """Return the per-box transition matrix over the collected count of item_type
+
+    Entry [k, j] is the probability that a box moves the collection from k to j
+    items, with item numbers drawn as in get_random_item_number (uniformly,
+    or under the category's bias rule).
+    """
+    total = loot_box.unique_items[item_type]["total"]
+    states = np.arange(total + 1)
+
+    # Single draw: stay on a duplicate, advance on a new item
+    draw = np.zeros((total + 1, total + 1))
+    if total > 0:
+        new = _new_item_probabilities(loot_box, item_type)
+        draw[states, states] = 1.0 - new
+        draw[states[:-1], states[:-1] + 1] = new[:-1]
+    else:
+        draw[0, 0] = 1.0
+
+    matrix = np.zeros_like(draw)
+    power = np.eye(total + 1)
+    for probability in draws_per_box(loot_box, item_type):
+        matrix += probability * power
+        power = power @ draw
+    return matrix
+
+
+def expected_boxes_to_complete(loot_box, item_type, collected=None):
+    """Return the exact expected number of further boxes until item_type is complete"""
+    total = loot_box.unique_items[item_type]["total"]
+    start = _collected_count(loot_box, item_type, collected)
+    if start >= total:
+        return 0.0
+    if sum(slot_rates(loot_box, item_type)) == 0:
+        return float("inf")
+
+    # The chain only moves forward, so solve first-step equations from the top down
+    matrix = transition_matrix(loot_box, item_type)
+    expected = np.zeros(total + 1)
+    for k in range(total - 1, start - 1, -1):
+        expected[k] = (1.0 + matrix[k, k + 1:] @ expected[k + 1:]) / (1.0 - matrix[k, k])
+    return float(expected[start])
+
+
+def completion_probability(loot_box, item_type, boxes, collected=None):
+    """Return the probability that item_type is complete after the given number of boxes"""
+    total = loot_box.unique_items[item_type]["total"]
+    state = np.zeros(total + 1)
+    state[_collected_count(loot_box, item_type, collected)] = 1.0
+    state = state @ np.linalg.matrix_power(transition_matrix(loot_box, item_type), boxes)
+    return float(state[total])
+
+
+def boxes_to_complete_percentiles(loot_box, item_type, percentiles=DEFAULT_PERCENTILES, collected=None):
+    """Return {q: smallest box count b with P(complete after b boxes) >= q}
+
+    Uses binary lifting over repeated squares of the transition matrix, so each
+    percentile costs O(log b) vector-matrix products.
+    """
+    total = loot_box.unique_items[item_type]["total"]
+    start = _collected_count(loot_box, item_type, collected)
+    if start >= total:
+        return {q: 0 for q in percentiles}
+    if sum(slot_rates(loot_box, item_type)) == 0:
+        return {q: float("inf") for q in percentiles}
+
+    initial = np.zeros(total + 1)
+    initial[start] = 1.0
+
+    # powers[j] is the transition matrix for 2**j boxes
+    powers = [transition_matrix(loot_box, item_type)]
+    while (initial @ powers[-1])[total] < max(percentiles) and len(powers) < MAX_POWER:
+        powers.append(powers[-1] @ powers[-1])
+
+    result = {}
+    for q in percentiles:
+        state = initial
+        boxes = 0
+        for j in range(len(powers) - 1, -1, -1):
+            candidate = state @ powers[j]
+            if candidate[total] < q:
+                state = candidate
+                boxes += 2 ** j
+        result[q] = boxes + 1
+    return result
+
+
+def _expected_duplicate_draws(loot_box, item_type, uncollected):
+    """Expected duplicate draws of item_type in one box given the expected uncollected count
+
+    Slots resolve in order, so later slots see the items earlier slots added.
+    """
+    total = loot_box.unique_items[item_type]["total"]
+    if total == 0:
+        return 0.0
+    duplicates = 0.0
+    for rate in slot_rates(loot_box, item_type):
+        duplicates += rate * (1.0 - uncollected / total)
+        uncollected *= 1.0 - rate / total
+    return duplicates
+
+
+def expected_currency_per_box(loot_box, collected=None):
+    """Return expected currency from the next box given the current collection state"""
+    _require_no_guarantees(loot_box)
+    expected = 0.0
+    for item, properties in loot_box.item_properties.items():
+        if item in loot_box.unique_items:
+            if _is_biased(loot_box, item):
+                duplicates = collection_distribution(loot_box, item, 1, collected)["duplicates"].mean()
+            else:
+                total = loot_box.unique_items[item]["total"]
+                uncollected = total - _collected_count(loot_box, item, collected)
+                duplicates = _expected_duplicate_draws(loot_box, item, uncollected)
+            expected += duplicates * properties["duplicate_currency"]
+        else:
+            expected += sum(slot_rates(loot_box, item)) * properties["value"]
+    return expected
+
+
+def expected_currency(loot_box, boxes, collected=None):
+    """Return expected total currency over the next number of boxes
+
+    Duplicate refunds rise as the collection fills; the expected uncollected
+    count decays geometrically per box, which keeps this closed-form.
+    Categories under a bias rule use the exact collection distribution instead.
+    """
+    _require_no_guarantees(loot_box)
+    expected = 0.0
+    box_index = np.arange(boxes)
+    for item, properties in loot_box.item_properties.items():
+        if item not in loot_box.unique_items:
+            expected += boxes * sum(slot_rates(loot_box, item)) * properties["value"]
+            continue
+        total = loot_box.unique_items[item]["total"]
+        if total == 0:
+            continue
+        if _is_biased(loot_box, item):
+            duplicates = collection_distribution(loot_box, item, boxes, collected)["duplicates"].mean()
+            expected += duplicates * properties["duplicate_currency"]
+            continue
+        uncollected = total - _collected_count(loot_box, item, collected)
+        decay = np.prod([1.0 - rate / total for rate in slot_rates(loot_box, item)])
+        per_box = _expected_duplicate_draws(loot_box, item, uncollected * decay ** box_index)
+        expected += float(np.sum(per_box)) * properties["duplicate_currency"]
+    return expected
+
+
+def completion_report(loot_box, percentiles=DEFAULT_PERCENTILES, collected=None):
+    """Return expected boxes-to-complete and percentiles for every category"""
+    report = {}
+    for item_type, item in loot_box.unique_items.items():
+        if item["total"] == 0:
+            continue
+        report[item_type] = {
+            "total": item["total"],
+            "collected": _collected_count(loot_box, item_type, collected),
+            "expected_boxes": expected_boxes_to_complete(loot_box, item_type, collected),
+            "percentiles": boxes_to_complete_percentiles(loot_box, item_type, percentiles, collected),
+        }
+    return report
+
+
+class Histogram(namedtuple("Histogram", ["values", "probabilities"])):
+    """Exact distribution over integer values: probabilities[i] = P(value == values[i])"""
+
+    __slots__ = ()
+
+    def mean(self):
+        return float(self.values @ self.probabilities)
+
+    def quantile(self, q):
+        """Return the smallest value v with P(value <= v) >= q"""
+        cumulative = np.cumsum(self.probabilities)
+        return int(self.values[min(np.searchsorted(cumulative, q - 1e-12), len(self.values) - 1)])
+
+
+def _trim(offset, pmf):
+    """Drop exact zeros from both ends of a pmf starting at offset"""
+    nonzero = np.flatnonzero(pmf)
+    if nonzero.size == 0:
+        return offset, np.zeros(1)
+    return offset + nonzero[0], pmf[nonzero[0]:nonzero[-1] + 1]
+
+
+def _convolve(a, b):
+    """Convolve two pmfs, switching to FFT once direct convolution gets expensive"""
+    if len(a) * len(b) <= DIRECT_CONVOLVE_LIMIT:
+        return np.convolve(a, b)
+    size = len(a) + len(b) - 1
+    fft_size = 1 << (size - 1).bit_length()
+    result = np.fft.irfft(np.fft.rfft(a, fft_size) * np.fft.rfft(b, fft_size), fft_size)[:size]
+    # Entries below FFT rounding error are noise, not probability mass
+    result[result < np.finfo(float).eps * result.max()] = 0.0
+    return result
+
+
+def _binomial_pmf(trials, p):
+    """Return (offset, pmf) of Binomial(trials, p), trimmed to where it does not underflow"""
+    if p <= 0.0 or trials == 0:
+        return 0, np.ones(1)
+    if p >= 1.0:
+        return trials, np.ones(1)
+    successes = np.arange(trials + 1)
+    ratios = np.log(trials - successes[1:] + 1) - np.log(successes[1:])
+    log_choose = np.concatenate([[0.0], np.cumsum(ratios)])
+    pmf = np.exp(log_choose + successes * np.log(p) + (trials - successes) * np.log1p(-p))
+    # Renormalize away rounding accumulated in the cumulative log coefficients
+    return _trim(0, pmf / pmf.sum())
+
+
+def _draw_pmf(loot_box, item, boxes):
+    """Return (offset, pmf) of how many times item is drawn over boxes
+
+    Each slot contributes an independent Binomial(boxes, rate) count.
+    """
+    _require_no_guarantees(loot_box)
+    offset, pmf = 0, np.ones(1)
+    for rate in slot_rates(loot_box, item):
+        slot_offset, slot_pmf = _binomial_pmf(boxes, rate)
+        offset, pmf = _trim(offset + slot_offset, _convolve(pmf, slot_pmf))
+    return offset, pmf
+
+
+def draw_distribution(loot_box, item, boxes):
+    """Return the exact Histogram of how many times item is drawn over the next boxes"""
+    offset, pmf = _draw_pmf(loot_box, item, boxes)
+    return Histogram(np.arange(offset, offset + len(pmf)), pmf)
+
+
+def _occupancy(new_probabilities, start, draw_offset, draw_pmf):
+    """Mix the new-item chain over a draw count distribution
+
+    new_probabilities[k] is the chance a draw is new with k items collected.
+    Returns the pmfs of items gained (index m) and of duplicates (index d)
+    after a random number of draws, starting from start collected.
+    """
+    remaining = len(new_probabilities) - 1 - start
+    advance = new_probabilities[start:]
+    stay = 1.0 - advance
+
+    # Jump straight to the first draw count with any probability mass
+    step = np.diag(stay) + np.diag(advance[:-1], 1)
+    state = np.linalg.matrix_power(step, draw_offset)[0]
+
+    gained_pmf = np.zeros(remaining + 1)
+    duplicate_pmf = np.zeros(draw_offset + len(draw_pmf))
+    for draws, weight in enumerate(draw_pmf, draw_offset):
+        gained_pmf += weight * state
+        # m items gained over draws draws means draws - m duplicates
+        top = min(draws, remaining)
+        duplicate_pmf[draws - top:draws + 1] += weight * state[top::-1]
+        state, previous = state * stay, state
+        state[1:] += previous[:-1] * advance[:-1]
+    return gained_pmf, duplicate_pmf
+
+
+def collection_distribution(loot_box, item, boxes, collected=None):
+    """Return exact distributions for one category after the next boxes
+
+    The collected count after a number of boxes depends only on how many times
+    the category was drawn, so the chain is mixed over the exact draw count
+    distribution instead of being stepped box by box. Returns Histograms keyed
+    "draws" and "currency", plus "collected" and "duplicates" for unique items.
+    Currency counts only this category's drops or duplicate refunds.
+    """
+    offset, pmf = _draw_pmf(loot_box, item, boxes)
+    draws = Histogram(np.arange(offset, offset + len(pmf)), pmf)
+    properties = loot_box.item_properties[item]
+    if item not in loot_box.unique_items:
+        return {"draws": draws, "currency": Histogram(draws.values * properties["value"], pmf)}
+
+    total = loot_box.unique_items[item]["total"]
+    start = _collected_count(loot_box, item, collected)
+    if total == 0:
+        gained_pmf, duplicate_pmf = np.ones(1), np.ones(1)
+    else:
+        gained_pmf, duplicate_pmf = _occupancy(_new_item_probabilities(loot_box, item), start, offset, pmf)
+    duplicate_offset, duplicate_pmf = _trim(0, duplicate_pmf)
+    duplicates = Histogram(np.arange(duplicate_offset, duplicate_offset + len(duplicate_pmf)), duplicate_pmf)
+    return {
+        "draws": draws,
+        "collected": Histogram(np.arange(start, start + len(gained_pmf)), gained_pmf),
+        "duplicates": duplicates,
+        "currency": Histogram(duplicates.values * properties["duplicate_currency"], duplicate_pmf),
+    }
+
+
+def collection_distributions(loot_box, boxes, collected=None):
+    """Return collection_distribution for every category that can drop"""
+    return {
+        item: collection_distribution(loot_box, item, boxes, collected)
+        for item in loot_box.item_properties
+        if sum(slot_rates(loot_box, item)) > 0
+    }
+
+
+def drop_currency_distribution(loot_box, boxes):
+    """Return the exact Histogram of total currency from currency drops over the next boxes
+
+    Currency drops do not depend on the collection, so each box adds an
+    independent copy of the same per-box distribution; boxes copies are summed
+    by repeated squaring. Duplicate refunds are excluded: they depend jointly
+    on every unique category's collection, see collection_distribution.
+    """
+    _require_no_guarantees(loot_box)
+    values = {item: properties["value"] for item, properties in loot_box.item_properties.items()
+              if item not in loot_box.unique_items}
+    unit = np.gcd.reduce([value for value in values.values() if value > 0] or [1])
+
+    box_pmf = np.ones(1)
+    for loot_table in loot_box.slot_loot_tables:
+        slot_pmf = np.zeros(max(values.values(), default=0) // unit + 1)
+        for item, rate in loot_table.items():
+            slot_pmf[values.get(item, 0) // unit] += rate / 100
+        box_pmf = _convolve(box_pmf, slot_pmf)
+
+    offset, pmf = 0, np.ones(1)
+    power_offset, power = _trim(0, box_pmf)
+    while boxes:
+        if boxes & 1:
+            offset, pmf = _trim(offset + power_offset, _convolve(pmf, power))
+        boxes >>= 1
+        if boxes:
+            power_offset, power = _trim(2 * power_offset, _convolve(power, power))
+    return Histogram((np.arange(offset, offset + len(pmf))) * unit, pmf)
@@ -0,0 +1,277 @@
+import io
+import json
+import os
+import struct
+import tempfile
+import zipfile
+
+import numpy as np
+
+from lootbox_config import find_config, load_config, resolve_config
+
+SNAPSHOT_MAGIC = b"LBXS"
+SNAPSHOT_VERSION = 1
+# Boxes opened between checkpoints by run_checkpointed
+DEFAULT_CHECKPOINT_EVERY = 1_000_000
+
+# magic, format version, raw sha256 of the config, boxes opened, total currency,
+# total duplicates, number of currency categories
+_HEADER = struct.Struct("<4sH32sqqqH")
+# random.Random state: version, 624 Mersenne Twister words plus the index, and
+# gauss_next as a presence flag and value
+_PY_RANDOM = struct.Struct("<B625I?d")
+_LENGTH = struct.Struct("<I")
+# Cohort snapshots are .npz files, which are zip archives
+_NPZ_MAGIC = b"PK\x03\x04"
+# What malformed snapshot data raises while being parsed, besides ValueError
+_CORRUPT_ERRORS = (struct.error, KeyError, IndexError, TypeError, AttributeError)
+
+
+def _encode_rng_state(rng):
+    return json.dumps(rng.bit_generator.state, default=lambda value: value.tolist()).encode()
+
+
+def _decode_rng(data):
+    state = json.loads(data)
+    bit_generator = getattr(np.random, state["bit_generator"])()
+    bit_generator.state = state
+    return np.random.Generator(bit_generator)
+
+
+def _snapshot_config(content_hash, config):
+    """Resolve the config a snapshot was taken under, checking its hash"""
+    if config is None:
+        compiled = find_config(content_hash) or load_config()
+    else:
+        compiled = resolve_config(config)
+    if compiled.content_hash != content_hash:
+        raise ValueError(f"Snapshot was taken with config {content_hash[:12]}, "
+                         f"got config {compiled.content_hash[:12]}")
+    return compiled
+
+
+def encode_loot_box(loot_box):
+    """Serialize a LootBox's full state to compact snapshot bytes
+
+    The snapshot holds the config hash, counters, currency drop counts, the
+    collected bitsets, the ledger and both random streams, so a restored
+    LootBox continues exactly where this one stopped. Drop tables come from
+    the config; edits made to an instance's slot_loot_tables are not saved.
+    """
+    currency_items = [item for item in loot_box.item_properties if item not in loot_box.unique_items]
+    header = _HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, bytes.fromhex(loot_box.config.content_hash),
+        loot_box.boxes_opened, loot_box.total_currency, loot_box.total_duplicates, len(currency_items),
+    )
+    drop_counts = struct.pack(f"<{len(currency_items)}q",
+                              *(loot_box.item_properties[item]["collected"] for item in currency_items))
+    collection = loot_box.pack_collection()
+    rng_state = _encode_rng_state(loot_box.rng)
+    version, internal, gauss_next = loot_box._py_random.getstate()
+    py_random = _PY_RANDOM.pack(version, *internal, gauss_next is not None, gauss_next or 0.0)
+    # Pity counters, in the config's guarantee rule order
+    counters = [loot_box.pity_counters[rule.item] for rule in loot_box.config.guarantee_rules]
+    pity = struct.pack(f"<H{len(counters)}q", len(counters), *counters)
+    # Ledger flows, sources x currencies
+    flows = loot_box.ledger.flows
+    ledger = struct.pack(f"<HH{flows.size}q", *flows.shape, *flows.ravel().tolist())
+    return b"".join([
+        header, drop_counts,
+        _LENGTH.pack(len(collection)), collection,
+        _LENGTH.pack(len(rng_state)), rng_state,
+        py_random, pity, ledger,
+    ])
+
+
+def decode_loot_box(data, config=None):
+    """Restore a LootBox from encode_loot_box bytes
+
+    config defaults to the config the snapshot was taken with, when it is the
+    default config or has been compiled in this process; otherwise pass it in.
+    Raises ValueError if data is truncated or otherwise not a valid snapshot.
+    """
+    try:
+        return _decode_loot_box(memoryview(data), config)
+    except _CORRUPT_ERRORS as e:
+        raise ValueError(f"Corrupt snapshot: {e}") from e
+
+
+def _decode_loot_box(data, config):
+    from lootbox_model import LootBox
+
+    (magic, version, digest, boxes_opened, total_currency, total_duplicates,
+     num_currency) = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Not a LootBox snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    offset = _HEADER.size
+
+    loot_box = LootBox(_snapshot_config(digest.hex(), config))
+    drop_counts = struct.unpack_from(f"<{num_currency}q", data, offset)
+    offset += 8 * num_currency
+    currency_items = [item for item in loot_box.item_properties if item not in loot_box.unique_items]
+    if len(currency_items) != num_currency:
+        raise ValueError("Snapshot currency categories do not match the config")
+    for item, count in zip(currency_items, drop_counts):
+        loot_box.item_properties[item]["collected"] = count
+
+    sections = []
+    for _ in range(2):
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        if offset + length > len(data):
+            raise ValueError("Corrupt snapshot: section runs past the end of the data")
+        sections.append(bytes(data[offset:offset + length]))
+        offset += length
+    collection, rng_state = sections
+    loot_box.unpack_collection(collection)
+    loot_box.rng = _decode_rng(rng_state)
+
+    values = _PY_RANDOM.unpack_from(data, offset)
+    gauss_next = values[-1] if values[-2] else None
+    loot_box._py_random.setstate((values[0], tuple(values[1:626]), gauss_next))
+    offset += _PY_RANDOM.size
+
+    (num_counters,) = struct.unpack_from("<H", data, offset)
+    counters = struct.unpack_from(f"<{num_counters}q", data, offset + 2)
+    offset += 2 + 8 * num_counters
+    if num_counters != len(loot_box.config.guarantee_rules):
+        raise ValueError("Snapshot pity counters do not match the config")
+    for rule, counter in zip(loot_box.config.guarantee_rules, counters):
+        loot_box.pity_counters[rule.item] = counter
+
+    shape = struct.unpack_from("<HH", data, offset)
+    if shape != loot_box.ledger.flows.shape:
+        raise ValueError("Snapshot ledger does not match the config's currencies")
+    size = shape[0] * shape[1]
+    loot_box.ledger.flows[...] = np.array(struct.unpack_from(f"<{size}q", data, offset + 4)).reshape(shape)
+    offset += 4 + 8 * size
+    if offset != len(data):
+        raise ValueError("Trailing bytes after LootBox snapshot")
+
+    loot_box.boxes_opened = boxes_opened
+    loot_box.total_currency = total_currency
+    loot_box.total_duplicates = total_duplicates
+    return loot_box
+
+
+_COHORT_ARRAYS = ("collected", "collected_counts", "drop_counts", "currency", "duplicates", "boxes_opened",
+                  "pity_counters", "ledger")
+
+
+def encode_cohort(cohort):
+    """Serialize a LootBoxCohort's arrays, RNG state and config hash to .npz bytes"""
+    meta = json.dumps({
+        "version": SNAPSHOT_VERSION,
+        "config_hash": cohort.config.content_hash,
+        "rng": json.loads(_encode_rng_state(cohort.rng)),
+    }).encode()
+    buffer = io.BytesIO()
+    np.savez(buffer, meta=np.frombuffer(meta, dtype=np.uint8),
+             **{name: getattr(cohort, name) for name in _COHORT_ARRAYS})
+    return buffer.getvalue()
+
+
+def decode_cohort(data, config=None):
+    """Restore a LootBoxCohort from encode_cohort bytes
+
+    Raises ValueError if data is truncated or otherwise not a valid snapshot.
+    """
+    try:
+        return _decode_cohort(data, config)
+    except _CORRUPT_ERRORS + (OSError, EOFError, NotImplementedError, zipfile.BadZipFile) as e:
+        raise ValueError(f"Corrupt snapshot: {e}") from e
+
+
+def _decode_cohort(data, config):
+    from lootbox_cohort import LootBoxCohort
+
+    if bytes(data[:len(_NPZ_MAGIC)]) != _NPZ_MAGIC:
+        raise ValueError("Not a LootBox snapshot")
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        meta = json.loads(arrays["meta"].tobytes())
+        if meta["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {meta['version']}")
+        cohort = LootBoxCohort(0, _snapshot_config(meta["config_hash"], config))
+        for name in _COHORT_ARRAYS:
+            setattr(cohort, name, arrays[name])
+    if any(len(getattr(cohort, name)) != len(cohort.boxes_opened) for name in _COHORT_ARRAYS):
+        raise ValueError("Corrupt snapshot: arrays disagree on the number of players")
+    if cohort.collected.shape[1] != (cohort.total_items + 7) // 8:
+        raise ValueError("Snapshot collection width does not match the config")
+    cohort.players = len(cohort.boxes_opened)
+    cohort._all_rows = np.arange(cohort.players)
+    cohort.rng = _decode_rng(json.dumps(meta["rng"]))
+    return cohort
+
+
+def write_atomic(path, data):
+    """Write bytes to path via a temporary file and os.replace
+
+    Readers see either the previous file or the complete new one, never a
+    partial write, even if the process dies mid-checkpoint.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def save_snapshot(state, path):
+    """Atomically write a LootBox or LootBoxCohort snapshot to path"""
+    from lootbox_cohort import LootBoxCohort
+
+    data = encode_cohort(state) if isinstance(state, LootBoxCohort) else encode_loot_box(state)
+    write_atomic(path, data)
+
+
+def load_snapshot(path, config=None):
+    """Load a LootBox or LootBoxCohort snapshot written by save_snapshot"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(SNAPSHOT_MAGIC)] == SNAPSHOT_MAGIC:
+        return decode_loot_box(data, config)
+    return decode_cohort(data, config)
+
+
+def _boxes_done(state):
+    boxes_opened = state.boxes_opened
+    return int(boxes_opened.min()) if isinstance(boxes_opened, np.ndarray) else boxes_opened
+
+
+def run_checkpointed(state, path, boxes, every=DEFAULT_CHECKPOINT_EVERY):
+    """Open boxes until state has opened boxes in total, checkpointing to path
+
+    state is a LootBox or a LootBoxCohort (every player opens boxes). If path
+    already holds a snapshot, the run resumes from it instead of from state,
+    so rerunning the same call after a crash picks up at the last checkpoint.
+    A snapshot is written atomically after every `every` boxes. Checkpoints
+    fall on multiples of every, so rerunning an interrupted call draws exactly
+    what an uninterrupted one would. Draws depend on how boxes are batched,
+    though: extending a finished run whose target was not a multiple of every
+    (say to 2500, then to 5000) gives a different, equally valid, sequence
+    from a single run to 5000. Returns the final state.
+    """
+    if every <= 0:
+        raise ValueError("every must be positive")
+    if os.path.exists(path):
+        state = load_snapshot(path, state.config)
+
+    while True:
+        done = _boxes_done(state)
+        if done >= boxes:
+            return state
+        step = min(every - done % every, boxes - done)
+        if hasattr(state, "open_boxes_batch"):
+            state.open_boxes_batch(step)
+        else:
+            state.open_boxes(step)
+        save_snapshot(state, path)
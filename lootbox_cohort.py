@@ -0,0 +1,304 @@
+import numpy as np
+
+from lootbox_config import resolve_config
+from lootbox_economy import BOX_COST, CRAFTING, DROPS, REFUNDS, SOURCES
+from lootbox_model import LootBox
+from lootbox_pity import apply_guarantee_step, biased_threshold_count, new_item_probability
+
+
+class LootBoxCohort:
+    """Many players' loot box state held as NumPy arrays, stepped together
+
+    Struct-of-arrays counterpart to LootBox: every player's collection lives in
+    one packed bitmap (players x total items, one bit per item) alongside
+    per-player currency, duplicate and box counters. open_boxes opens a box for
+    every player in a single vectorized step; player(i) copies one row out into
+    a familiar single-player LootBox and load_player(i, loot_box) writes it back.
+
+    With stratified set, each step's slot outcomes are drawn with stratified
+    uniforms across players (see AliasTable.sample_stratified): every player's
+    draws keep their distribution, but outcome proportions across the cohort
+    match the drop rates almost exactly.
+    """
+
+    def __init__(self, players, config=None, seed=None, stratified=False):
+        self.config = resolve_config(config)
+        self.players = players
+        self.rng = np.random.default_rng(seed)
+        self.stratified = stratified
+
+        # Each unique category occupies a contiguous range of bits in the bitmap
+        totals = self.config.totals
+        self.item_offsets = np.concatenate([[0], np.cumsum(totals)[:-1]]).astype(np.int64)
+        self.total_items = int(totals.sum())
+        self.collected = np.zeros((players, (self.total_items + 7) // 8), dtype=np.uint8)
+
+        num_categories = len(self.config.categories)
+        self.collected_counts = np.zeros((players, num_categories), dtype=np.int32)
+        self.drop_counts = np.zeros((players, num_categories), dtype=np.int32)
+        self.currency = np.zeros(players, dtype=np.int64)
+        self.duplicates = np.zeros(players, dtype=np.int64)
+        self.boxes_opened = np.zeros(players, dtype=np.int64)
+        # Boxes without each guaranteed item, one column per guarantee rule
+        self.pity_counters = np.zeros((players, len(self.config.guarantee_rules)), dtype=np.int64)
+        # Signed currency flows per player, by source and currency type
+        self.ledger = np.zeros((players, len(SOURCES), len(self.config.economy.currencies)), dtype=np.int64)
+        self._all_rows = np.arange(players)
+
+        # Opt-in draw tracking, see track_draws
+        self.natural_draws = None
+        self.log_weights = None
+        self._log_ratios = None
+
+    def track_draws(self, nominal=None):
+        """Start counting each player's natural draws and, given a nominal config, their likelihood ratio
+
+        Natural draws are slot outcomes per category before guarantee rules
+        replace any, so their expectation follows from the drop rates alone.
+        With nominal, the cohort is treated as sampling from a proposal config
+        for importance sampling: log_weights accumulates each player's log
+        likelihood ratio of nominal to this cohort's config. Guarantee rules and
+        item draws act identically under both, so only slot outcomes count.
+        """
+        self.natural_draws = np.zeros(self.drop_counts.shape, dtype=np.int64)
+        if nominal is None:
+            return
+        nominal = resolve_config(nominal)
+        if nominal.categories != self.config.categories or len(nominal.slot_loot_tables) != len(self.config.slot_loot_tables):
+            raise ValueError("Nominal config must have the same categories and slots as the cohort config")
+        log_ratios = []
+        for slot_index, (target, proposal) in enumerate(zip(nominal.slot_loot_tables, self.config.slot_loot_tables)):
+            ratios = np.zeros(len(self.config.categories))
+            for item, category_id in self.config.category_ids.items():
+                p, q = target.get(item, 0.0), proposal.get(item, 0.0)
+                if p > 0 and q <= 0:
+                    raise ValueError(f"Slot {slot_index+1} of the cohort config cannot draw {item}")
+                if p > 0:
+                    ratios[category_id] = np.log(p / q)
+            log_ratios.append(ratios)
+        self._log_ratios = tuple(log_ratios)
+        self.log_weights = np.zeros(self.players)
+
+    def open_boxes(self, count=1, rows=None):
+        """Open count boxes for every player, or only for the (unique) player indices in rows"""
+        rows = self._all_rows if rows is None else np.asarray(rows)
+        for _ in range(count):
+            self._open_box(rows)
+
+    def _open_box(self, rows):
+        config = self.config
+        n = len(rows)
+        all_rows = rows is self._all_rows
+        num_categories = self.drop_counts.shape[1]
+        bytes_per_player = self.collected.shape[1]
+        # Flat views avoid slower 2-D fancy indexing on large cohorts
+        drop_counts = self.drop_counts.reshape(-1)
+        collected_counts = self.collected_counts.reshape(-1)
+        collected = self.collected.reshape(-1)
+        economy = config.economy
+        ledger = self.ledger.reshape(-1)
+        ledger_stride = self.ledger.shape[1] * self.ledger.shape[2]
+        num_currencies = self.ledger.shape[2]
+        players = slice(None) if all_rows else rows
+
+        box_categories = np.empty((n, len(config.samplers)), dtype=np.int32)
+        for slot_index, (sampler, slot_category_ids) in enumerate(zip(config.samplers, config.slot_category_ids)):
+            draws = sampler.sample_stratified(n, self.rng) if self.stratified else sampler.sample(n, self.rng)
+            box_categories[:, slot_index] = slot_category_ids[draws]
+        if self.natural_draws is not None:
+            natural_draws = self.natural_draws.reshape(-1)
+            for categories in box_categories.T:
+                natural_draws[rows * num_categories + categories] += 1
+            if self._log_ratios is not None:
+                self.log_weights[players] += sum(ratios[categories] for ratios, categories
+                                                 in zip(self._log_ratios, box_categories.T))
+        if config.guarantee_rules:
+            counters = self.pity_counters[rows]
+            apply_guarantee_step(box_categories, config.guarantee_rules, counters)
+            self.pity_counters[rows] = counters
+
+        # Currency drops don't depend on the collection, so the whole box is booked at once
+        drop_values = config.values[box_categories]
+        self.currency[players] += drop_values.sum(axis=1)
+        if num_currencies == 1:
+            self.ledger[players, DROPS, 0] += drop_values.sum(axis=1)
+        else:
+            drop_currencies = economy.category_currency[box_categories]
+            for c in range(num_currencies):
+                self.ledger[players, DROPS, c] += np.where(drop_currencies == c, drop_values, 0).sum(axis=1)
+
+        # Slots resolve in order so a later slot sees items added by an earlier one
+        for categories in box_categories.T:
+            totals = config.totals[categories]
+            item_indices = np.floor(self.rng.random(n) * totals).astype(np.int64)
+            for rule in config.bias_rules.values():
+                self._bias_item_indices(rows, categories, item_indices, rule)
+
+            drop_counts[rows * num_categories + categories] += 1
+
+            has_item = totals > 0
+            item_rows = rows[has_item]
+            item_categories = categories[has_item]
+            bit_index = self.item_offsets[item_categories] + item_indices[has_item]
+            byte_index = item_rows * bytes_per_player + (bit_index >> 3)
+            bit_mask = (1 << (bit_index & 7)).astype(np.uint8)
+
+            present = (collected[byte_index] & bit_mask) != 0
+            duplicate_rows = item_rows[present]
+            self.duplicates[duplicate_rows] += 1
+            self.currency[duplicate_rows] += config.refunds[item_categories[present]]
+            if num_currencies > 1:
+                duplicate_categories = item_categories[present]
+                ledger[duplicate_rows * ledger_stride + REFUNDS * num_currencies
+                       + economy.category_currency[duplicate_categories]] += config.refunds[duplicate_categories]
+
+            new = ~present
+            new_rows = item_rows[new]
+            collected[byte_index[new]] |= bit_mask[new]
+            collected_counts[new_rows * num_categories + item_categories[new]] += 1
+
+        if num_currencies == 1:
+            # Everything earned is drops or refunds, so refunds follow from the currency total
+            self.ledger[players, REFUNDS, 0] = self.currency[players] - self.ledger[players, DROPS, 0]
+        self.boxes_opened[players] += 1
+        if economy.box_cost.any():
+            self.ledger[players, BOX_COST] -= economy.box_cost
+
+    def craft(self, item_type, rows=None):
+        """Craft one item of item_type for every player (or every player in rows) who can afford it
+
+        Each crafting player gets their lowest-numbered uncollected item and
+        pays the recipe cost. Returns the indices of the players who crafted.
+        """
+        recipe = self.config.economy.recipes.get(item_type)
+        if recipe is None:
+            raise ValueError(f"{item_type} cannot be crafted")
+        rows = self._all_rows if rows is None else np.asarray(rows)
+        total = int(self.config.totals[recipe.category])
+        # Only currencies the recipe charges count; box costs may leave others negative
+        affordable = ((self.ledger[rows].sum(axis=1) >= recipe.cost) | (recipe.cost == 0)).all(axis=1)
+        rows = rows[affordable & (self.collected_counts[rows, recipe.category] < total)]
+        if rows.size == 0:
+            return rows
+
+        start = int(self.item_offsets[recipe.category])
+        bits = np.unpackbits(self.collected[rows], axis=1, bitorder="little")[:, start:start + total]
+        bit_index = start + bits.argmin(axis=1)
+        self.collected[rows, bit_index >> 3] |= (1 << (bit_index & 7)).astype(np.uint8)
+        self.collected_counts[rows, recipe.category] += 1
+        self.ledger[rows, CRAFTING] -= recipe.cost
+        return rows
+
+    def to_snapshot(self):
+        """Serialize every player's state, the RNG state and the config hash to bytes"""
+        from lootbox_checkpoint import encode_cohort
+
+        return encode_cohort(self)
+
+    @classmethod
+    def from_snapshot(cls, data, config=None):
+        """Restore a cohort from to_snapshot bytes"""
+        from lootbox_checkpoint import decode_cohort
+
+        return decode_cohort(data, config)
+
+    def _bias_item_indices(self, rows, categories, item_indices, rule):
+        """Redraw item indices in place for players whose draw falls under a bias rule
+
+        Each affected player picks the k-th uncollected (or collected) bit of
+        their row directly, so no draw is ever rejected and retried.
+        """
+        total = int(self.config.totals[rule.category])
+        drawn = np.flatnonzero(categories == rule.category)
+        counts = self.collected_counts[rows[drawn], rule.category]
+        biased = counts >= biased_threshold_count(rule, total)
+        drawn, counts = drawn[biased], counts[biased]
+        if drawn.size == 0:
+            return
+
+        new = self.rng.random(drawn.size) < new_item_probability(rule, counts, total)
+        pool_sizes = np.where(new, total - counts, counts)
+        picks = np.floor(self.rng.random(drawn.size) * pool_sizes).astype(np.int64)
+
+        start = int(self.item_offsets[rule.category])
+        bits = np.unpackbits(self.collected[rows[drawn]], axis=1, bitorder="little")[:, start:start + total]
+        in_pool = bits != new[:, None]
+        item_indices[drawn] = (np.cumsum(in_pool, axis=1) > picks[:, None]).argmax(axis=1)
+
+    def collected_matrix(self, item_type):
+        """Return a players x total bool matrix of one category's collected items"""
+        category_id = self.config.category_ids[item_type]
+        start = int(self.item_offsets[category_id])
+        total = int(self.config.totals[category_id])
+        bits = np.unpackbits(self.collected, axis=1, bitorder="little")
+        return bits[:, start:start + total].astype(bool)
+
+    def player(self, index):
+        """Return a LootBox holding a copy of one player's state
+
+        The LootBox is detached: boxes it opens do not change the cohort until
+        passed back to load_player. Its random streams are seeded from the
+        cohort's, so a seeded cohort yields reproducible copies; each call
+        takes one draw from the cohort's stream.
+        """
+        loot_box = LootBox(self.config, seed=int(self.rng.integers(2**63)))
+        bits = np.unpackbits(self.collected[index], bitorder="little")
+        for item_type, item in loot_box.unique_items.items():
+            category_id = self.config.category_ids[item_type]
+            start = int(self.item_offsets[category_id])
+            item["collected"].update(np.flatnonzero(bits[start:start + item["total"]]) + 1)
+        for item, properties in loot_box.item_properties.items():
+            if item not in loot_box.unique_items:
+                properties["collected"] = int(self.drop_counts[index, self.config.category_ids[item]])
+        loot_box.total_currency = int(self.currency[index])
+        loot_box.total_duplicates = int(self.duplicates[index])
+        loot_box.boxes_opened = int(self.boxes_opened[index])
+        for rule, counter in zip(self.config.guarantee_rules, self.pity_counters[index]):
+            loot_box.pity_counters[rule.item] = int(counter)
+        loot_box.ledger.flows[...] = self.ledger[index]
+        loot_box.recount_collection()
+        return loot_box
+
+    def load_player(self, index, loot_box):
+        """Overwrite one player's row with the state of a LootBox on the same config"""
+        if loot_box.config is not self.config:
+            raise ValueError("LootBox config does not match the cohort config")
+        bits = np.zeros(self.collected.shape[1] * 8, dtype=np.uint8)
+        for item_type, item in loot_box.unique_items.items():
+            category_id = self.config.category_ids[item_type]
+            start = int(self.item_offsets[category_id])
+            bits[start:start + item["total"]] = item["collected"].as_array()[1:]
+            self.collected_counts[index, category_id] = loot_box.collected_counts[item_type]
+        self.collected[index] = np.packbits(bits, bitorder="little")
+        for item, properties in loot_box.item_properties.items():
+            if item not in loot_box.unique_items:
+                self.drop_counts[index, self.config.category_ids[item]] = properties["collected"]
+        self.currency[index] = loot_box.total_currency
+        self.duplicates[index] = loot_box.total_duplicates
+        self.boxes_opened[index] = loot_box.boxes_opened
+        for j, rule in enumerate(self.config.guarantee_rules):
+            self.pity_counters[index, j] = loot_box.pity_counters[rule.item]
+        self.ledger[index] = loot_box.ledger.flows
+
+    def get_stats(self):
+        """Return population-level means across the cohort"""
+        boxes = self.boxes_opened.sum()
+        completion = {}
+        for item_type, total in self.config.unique_item_totals.items():
+            if total == 0:
+                continue
+            collected = self.collected_counts[:, self.config.category_ids[item_type]]
+            completion[item_type] = {
+                "total": total,
+                "mean_collected": float(collected.mean()),
+                "completed_players": int((collected == total).sum()),
+            }
+        return {
+            "players": self.players,
+            "boxes_opened": int(boxes),
+            "avg_currency": float(self.currency.mean()),
+            "avg_currency_per_box": float(self.currency.sum() / boxes) if boxes > 0 else 0,
+            "avg_duplicates": float(self.duplicates.mean()),
+            "avg_balances": dict(zip(self.config.economy.currencies, self.ledger.sum(axis=1).mean(axis=0).tolist())),
+            "completion": completion,
+        }
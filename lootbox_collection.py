@@ -0,0 +1,186 @@
+import numpy as np
+
+
+class ItemPool:
+    """Item numbers 1..total split into uncollected and collected, with rank selection
+
+    A Fenwick tree counts uncollected items, so collecting, releasing and
+    picking the index-th uncollected (or collected) item in ascending order
+    all take O(log total) instead of rejection against the collection. Picks
+    depend only on which items are collected, never on the order they were
+    collected in, so a pool rebuilt from a snapshot draws what the original would.
+    """
+
+    __slots__ = ("total", "remaining", "_uncollected", "_tree", "_top")
+
+    def __init__(self, total, collected=()):
+        self.total = total
+        self.remaining = total
+        self._uncollected = [False] + [True] * total
+        # _tree[i] counts uncollected items in (i - lowbit(i), i]; built in O(total)
+        tree = [0] + [1] * total
+        for i in range(1, total + 1):
+            parent = i + (i & -i)
+            if parent <= total:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._top = 1 << (total.bit_length() - 1) if total else 0
+        for item_number in collected:
+            self.collect(item_number)
+
+    def _add(self, item_number, delta):
+        tree = self._tree
+        while item_number <= self.total:
+            tree[item_number] += delta
+            item_number += item_number & -item_number
+
+    def collect(self, item_number):
+        """Move an item to the collected side; no-op if it is already there"""
+        if self._uncollected[item_number]:
+            self._uncollected[item_number] = False
+            self.remaining -= 1
+            self._add(item_number, -1)
+
+    def release(self, item_number):
+        """Move an item back to the uncollected side; no-op if it is already there"""
+        if not self._uncollected[item_number]:
+            self._uncollected[item_number] = True
+            self.remaining += 1
+            self._add(item_number, 1)
+
+    def _select(self, index, collected):
+        # Descend the tree; the node at position + step covers exactly step items
+        position = 0
+        step = self._top
+        tree = self._tree
+        while step:
+            node = position + step
+            if node <= self.total:
+                count = step - tree[node] if collected else tree[node]
+                if count <= index:
+                    position = node
+                    index -= count
+            step >>= 1
+        return position + 1
+
+    def uncollected_item(self, index):
+        """Return the index-th smallest uncollected item (0 <= index < remaining)"""
+        return self._select(index, False)
+
+    def collected_item(self, index):
+        """Return the index-th smallest collected item (0 <= index < total - remaining)"""
+        return self._select(index, True)
+
+    def copy(self):
+        pool = ItemPool.__new__(ItemPool)
+        pool.total = self.total
+        pool.remaining = self.remaining
+        pool._uncollected = list(self._uncollected)
+        pool._tree = list(self._tree)
+        pool._top = self._top
+        return pool
+
+
+class CollectionBits:
+    """Fixed-width bitset of collected item numbers (1..total) for one category
+
+    Behaves like the set it replaces for membership, add, update, len and
+    iteration, but stores one bit per item. Bit 0 is unused so item numbers
+    index bits directly. pool() builds an ItemPool on first use and keeps it
+    in step with every later change.
+    """
+
+    __slots__ = ("total", "_bits", "_pool")
+
+    def __init__(self, total, items=()):
+        self.total = total
+        self._bits = bytearray(self.byte_width(total))
+        self._pool = None
+        if len(items):
+            self.update(items)
+
+    @staticmethod
+    def byte_width(total):
+        """Number of bytes needed to store a category with total items"""
+        return (total + 8) // 8
+
+    def __contains__(self, item_number):
+        if not 0 < item_number <= self.total:
+            return False
+        return bool(self._bits[item_number >> 3] & (1 << (item_number & 7)))
+
+    def add(self, item_number):
+        if not 0 < item_number <= self.total:
+            raise ValueError(f"Item number {item_number} out of range 1..{self.total}")
+        self._bits[item_number >> 3] |= 1 << (item_number & 7)
+        if self._pool is not None:
+            self._pool.collect(item_number)
+
+    def discard(self, item_number):
+        if 0 < item_number <= self.total:
+            self._bits[item_number >> 3] &= ~(1 << (item_number & 7)) & 0xFF
+            if self._pool is not None:
+                self._pool.release(item_number)
+
+    def update(self, items):
+        """Add many item numbers; NumPy arrays are merged in a single vectorized pass"""
+        if isinstance(items, np.ndarray):
+            if items.size == 0:
+                return
+            if items.min() < 1 or items.max() > self.total:
+                raise ValueError(f"Item numbers out of range 1..{self.total}")
+            mask = np.zeros(self.total + 1, dtype=bool)
+            mask[items] = True
+            packed = np.packbits(mask, bitorder="little")
+            self._bits = bytearray(np.frombuffer(self._bits, dtype=np.uint8) | packed)
+            if self._pool is not None:
+                for item_number in np.flatnonzero(mask).tolist():
+                    self._pool.collect(item_number)
+            return
+        for item_number in items:
+            self.add(item_number)
+
+    def clear(self):
+        self._bits = bytearray(len(self._bits))
+        self._pool = None
+
+    def pool(self):
+        """Return the ItemPool of uncollected and collected items, building it on first use"""
+        if self._pool is None:
+            self._pool = ItemPool(self.total, np.flatnonzero(self.as_array()).tolist())
+        return self._pool
+
+    def __len__(self):
+        return int.from_bytes(self._bits, "little").bit_count()
+
+    def __bool__(self):
+        return any(self._bits)
+
+    def __iter__(self):
+        return iter(np.flatnonzero(self.as_array()).tolist())
+
+    def __eq__(self, other):
+        if isinstance(other, CollectionBits):
+            return self.total == other.total and self._bits == other._bits
+        if isinstance(other, (set, frozenset)):
+            return set(self) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"CollectionBits({self.total}, {set(self)!r})"
+
+    def as_array(self):
+        """Return a bool array of length total + 1 where index i marks item i collected"""
+        bits = np.unpackbits(np.frombuffer(self._bits, dtype=np.uint8), bitorder="little")
+        return bits[:self.total + 1].astype(bool)
+
+    def to_bytes(self):
+        return bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, total, data):
+        if len(data) != cls.byte_width(total):
+            raise ValueError(f"Expected {cls.byte_width(total)} bytes for {total} items, got {len(data)}")
+        collection = cls(total)
+        collection._bits = bytearray(data)
+        return collection
@@ -0,0 +1,209 @@
+import copy
+import hashlib
+import json
+import os
+from types import MappingProxyType
+
+import numpy as np
+
+from lootbox_economy import compile_economy, validate_economy
+from lootbox_pity import compile_rules, validate_rules
+from lootbox_sampling import AliasTable
+
+CONFIG_VERSION = 1
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "configs")
+DEFAULT_CONFIG_PATH = os.path.join(CONFIG_DIR, "default.json")
+
+# Compiled configs keyed by content hash, shared by every LootBox in the process
+_compiled_configs = {}
+_loaded_paths = {}
+
+
+def _read_only(array):
+    array.setflags(write=False)
+    return array
+
+
+class CompiledConfig:
+    """Validated, immutable loot box configuration shared across LootBox instances
+
+    Holds the drop tables alongside everything derived from them: category ids,
+    per-category lookup arrays and a precompiled alias sampler for each slot.
+    """
+
+    def __init__(self, data, content_hash, source):
+        unique_items = data["unique_items"]
+        item_properties = data["item_properties"]
+
+        self.version = data["version"]
+        self.name = data.get("name", "")
+        self.content_hash = content_hash
+        self.source = source
+        self.unique_item_totals = MappingProxyType(dict(unique_items))
+        self.item_properties = MappingProxyType({
+            item: MappingProxyType(dict(properties)) for item, properties in item_properties.items()
+        })
+        self.slot_loot_tables = tuple(MappingProxyType(dict(table)) for table in data["slot_loot_tables"])
+
+        self.categories = tuple(item_properties)
+        self.category_ids = MappingProxyType({item: i for i, item in enumerate(self.categories)})
+        self.samplers = tuple(AliasTable(table.keys(), table.values()) for table in self.slot_loot_tables)
+        self.slot_category_ids = tuple(
+            _read_only(np.array([self.category_ids[item] for item in table], dtype=np.int32))
+            for table in self.slot_loot_tables
+        )
+
+        totals = np.zeros(len(self.categories), dtype=np.int64)
+        values = np.zeros(len(self.categories), dtype=np.int64)
+        refunds = np.zeros(len(self.categories), dtype=np.int64)
+        for item, category_id in self.category_ids.items():
+            if item in unique_items:
+                totals[category_id] = unique_items[item]
+                refunds[category_id] = item_properties[item]["duplicate_currency"]
+            else:
+                values[category_id] = item_properties[item]["value"]
+        self.totals = _read_only(totals)
+        self.values = _read_only(values)
+        self.refunds = _read_only(refunds)
+
+        # Optional pity rules: guarantee rules in config order, bias rules by category id
+        guarantee_rules, bias_rules = compile_rules(data, self.category_ids)
+        self.guarantee_rules = guarantee_rules
+        self.bias_rules = MappingProxyType(bias_rules)
+
+        # Currencies, box cost and crafting recipes; a single free currency by default
+        self.economy = compile_economy(data, self.category_ids)
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError("CompiledConfig is immutable")
+        super().__setattr__(name, value)
+
+    def __reduce__(self):
+        # Workers recompile (once, memoized) from the canonical source
+        return (compile_config, (json.loads(self.source),))
+
+    def __repr__(self):
+        return f"CompiledConfig(name={self.name!r}, version={self.version}, hash={self.content_hash[:12]})"
+
+    def to_dict(self):
+        """Return a mutable copy of the raw config data"""
+        return json.loads(self.source)
+
+
+def validate_config(data):
+    """Raise ValueError if raw config data is malformed"""
+    version = data.get("version")
+    if version != CONFIG_VERSION:
+        raise ValueError(f"Unsupported config version: {version} (expected {CONFIG_VERSION})")
+    for key in ("unique_items", "item_properties", "slot_loot_tables"):
+        if key not in data:
+            raise ValueError(f"Config is missing '{key}'")
+
+    unique_items = data["unique_items"]
+    item_properties = data["item_properties"]
+    for item_type, total in unique_items.items():
+        if not isinstance(total, int) or total < 0:
+            raise ValueError(f"{item_type} total must be a non-negative integer (got {total!r})")
+        if item_type not in item_properties:
+            raise ValueError(f"{item_type} has no item properties")
+    for item, properties in item_properties.items():
+        required = "duplicate_currency" if item in unique_items else "value"
+        if required not in properties:
+            raise ValueError(f"{item} is missing '{required}'")
+
+    if not data["slot_loot_tables"]:
+        raise ValueError("Config must define at least one slot loot table")
+    for i, loot_table in enumerate(data["slot_loot_tables"]):
+        for item, rate in loot_table.items():
+            if item not in item_properties:
+                raise ValueError(f"Slot {i+1} references unknown item: {item}")
+            if not isinstance(rate, (int, float)) or isinstance(rate, bool):
+                raise ValueError(f"Slot {i+1} drop rate for {item} must be a number (got {rate!r})")
+            if rate < 0:
+                raise ValueError(f"Slot {i+1} drop rate for {item} is negative")
+        total_rate = sum(loot_table.values())
+        if abs(total_rate - 100.0) > 0.01:
+            raise ValueError(f"Slot {i+1} drop rates must sum to 100% (current sum: {total_rate}%)")
+
+    validate_rules(data)
+    validate_economy(data)
+
+
+def compile_config(data):
+    """Validate and compile raw config data, memoized by content hash"""
+    source = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    content_hash = hashlib.sha256(source.encode()).hexdigest()
+    compiled = _compiled_configs.get(content_hash)
+    if compiled is None:
+        validate_config(data)
+        compiled = CompiledConfig(json.loads(source), content_hash, source)
+        _compiled_configs[content_hash] = compiled
+    return compiled
+
+
+def find_config(content_hash):
+    """Return the compiled config with this content hash, or None if it was never compiled here"""
+    return _compiled_configs.get(content_hash)
+
+
+def _parse_file(path):
+    if path.endswith(".toml"):
+        import tomllib
+
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_config(path=DEFAULT_CONFIG_PATH):
+    """Load and compile a JSON or TOML config file
+
+    Files are re-read only when their modification time changes.
+    """
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    cached = _loaded_paths.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    compiled = compile_config(_parse_file(path))
+    _loaded_paths[path] = (mtime, compiled)
+    return compiled
+
+
+def merge_overrides(base, overrides):
+    """Return base config data with overrides applied
+
+    unique_items and item_properties are merged per entry; slot_loot_tables,
+    pity_rules, drop_mode and economy are replaced wholesale.
+    """
+    data = copy.deepcopy(base)
+    data["unique_items"].update(overrides.get("unique_items", {}))
+    for item, properties in overrides.get("item_properties", {}).items():
+        data["item_properties"].setdefault(item, {}).update(properties)
+    for key in ("slot_loot_tables", "pity_rules", "drop_mode", "economy"):
+        if key in overrides:
+            data[key] = copy.deepcopy(overrides[key])
+    if "name" in overrides:
+        data["name"] = overrides["name"]
+    return data
+
+
+def resolve_config(config=None):
+    """Turn any accepted config form into a CompiledConfig
+
+    Accepts None (the default config), a CompiledConfig, a path to a config
+    file, full config data (a dict with "version"), or a dict of overrides
+    on top of the default config.
+    """
+    if config is None:
+        return load_config()
+    if isinstance(config, CompiledConfig):
+        return config
+    if isinstance(config, (str, os.PathLike)):
+        return load_config(config)
+    if "version" in config:
+        return compile_config(config)
+    return compile_config(merge_overrides(load_config().to_dict(), config))
@@ -0,0 +1,256 @@
+"""Multi-currency ledger: earn sources, spend sinks and economy simulation
+
+Configs may add an "economy" section and tag item properties with the
+currency they pay in:
+
+    "item_properties": {"Currency High": {"value": 100, "currency": "gems"}, ...},
+    "economy": {
+        "currencies": ["coins", "gems"],
+        "box_cost": {"coins": 150},
+        "crafting": {"Chess Set: T3": {"gems": 500}}
+    }
+
+Items without a "currency" tag pay in the first currency. Without an economy
+section there is a single currency named "currency" and nothing costs anything,
+so the ledger's balance equals LootBox.total_currency.
+
+Every flow is recorded by source and currency as a signed amount: drops and
+duplicate refunds earn, box purchases and crafting spend. Balances may go
+negative through box costs, which models currency bought from outside the
+loop; crafting requires the full cost in hand.
+"""
+from collections import namedtuple
+from types import MappingProxyType
+
+import numpy as np
+
+DEFAULT_CURRENCY = "currency"
+
+SOURCES = ("drops", "refunds", "box_cost", "crafting")
+DROPS, REFUNDS, BOX_COST, CRAFTING = range(len(SOURCES))
+
+# currencies: names in config order. category_currency: currency index each
+# category id pays its drop value or duplicate refund in. box_cost: cost of
+# one box per currency. recipes: crafting recipes keyed by item name.
+Economy = namedtuple("Economy", ["currencies", "category_currency", "box_cost", "recipes"])
+
+# Crafting one uncollected item of a category costs `cost` (one amount per currency)
+CraftRecipe = namedtuple("CraftRecipe", ["item", "category", "cost"])
+
+
+def _currency_amounts(label, amounts, currencies, positive=False):
+    if not isinstance(amounts, dict):
+        raise ValueError(f"{label} must map currencies to amounts")
+    for currency, amount in amounts.items():
+        if currency not in currencies:
+            raise ValueError(f"{label} references unknown currency: {currency}")
+        if not isinstance(amount, int) or amount < 0:
+            raise ValueError(f"{label} {currency} must be a non-negative integer (got {amount!r})")
+    if positive and not any(amounts.values()):
+        raise ValueError(f"{label} must cost something")
+
+
+def validate_economy(data):
+    """Raise ValueError if the config's economy section or currency tags are malformed"""
+    economy = data.get("economy", {})
+    currencies = economy.get("currencies", [DEFAULT_CURRENCY])
+    if not currencies or not all(isinstance(currency, str) for currency in currencies):
+        raise ValueError("Economy currencies must be a non-empty list of names")
+    if len(set(currencies)) != len(currencies):
+        raise ValueError("Economy currencies must be unique")
+    for item, properties in data["item_properties"].items():
+        currency = properties.get("currency", currencies[0])
+        if currency not in currencies:
+            raise ValueError(f"{item} pays in unknown currency: {currency}")
+    _currency_amounts("Box cost", economy.get("box_cost", {}), currencies)
+    for item, cost in economy.get("crafting", {}).items():
+        if data["unique_items"].get(item, 0) == 0:
+            raise ValueError(f"Crafting recipe for {item}: no unique items to craft")
+        _currency_amounts(f"Crafting cost for {item}", cost, currencies, positive=True)
+
+
+def compile_economy(data, category_ids):
+    """Return the Economy for validated config data"""
+    economy = data.get("economy", {})
+    currencies = tuple(economy.get("currencies", [DEFAULT_CURRENCY]))
+    index = {currency: i for i, currency in enumerate(currencies)}
+
+    def amounts(costs):
+        array = np.zeros(len(currencies), dtype=np.int64)
+        for currency, amount in costs.items():
+            array[index[currency]] = amount
+        array.setflags(write=False)
+        return array
+
+    category_currency = np.zeros(len(category_ids), dtype=np.int64)
+    for item, category_id in category_ids.items():
+        category_currency[category_id] = index[data["item_properties"][item].get("currency", currencies[0])]
+    category_currency.setflags(write=False)
+    recipes = {
+        item: CraftRecipe(item, category_ids[item], amounts(cost))
+        for item, cost in economy.get("crafting", {}).items()
+    }
+    return Economy(currencies, category_currency, amounts(economy.get("box_cost", {})), MappingProxyType(recipes))
+
+
+def draw_flows(economy, categories, item_numbers, is_new, values, refunds, per_box=False):
+    """Ledger flows from resolved (boxes, slots) batch draws, box costs included
+
+    values and refunds are per-category-id currency amounts. Returns a
+    (sources, currencies) total, or with per_box a (boxes, sources,
+    currencies) array whose rows are each box's flows.
+    """
+    count = categories.shape[0]
+    num_currencies = len(economy.currencies)
+    has_item = item_numbers > 0
+    amounts = np.where(has_item, np.where(is_new, 0, refunds[categories]), values[categories])
+    keys = np.where(has_item, REFUNDS, DROPS) * num_currencies + economy.category_currency[categories]
+    size = len(SOURCES) * num_currencies
+
+    if per_box:
+        keys = keys + (np.arange(count) * size)[:, None]
+        flows = np.bincount(keys.ravel(), weights=amounts.ravel(), minlength=count * size)
+        flows = flows.astype(np.int64).reshape(count, len(SOURCES), num_currencies)
+        flows[:, BOX_COST] -= economy.box_cost
+        return flows
+
+    flows = np.bincount(keys.ravel(), weights=amounts.ravel(), minlength=size)
+    flows = flows.astype(np.int64).reshape(len(SOURCES), num_currencies)
+    flows[BOX_COST] -= count * economy.box_cost
+    return flows
+
+
+def flows_dict(economy, flows):
+    """Render a (sources, currencies) flow array as {currency: {source: amount, "balance": amount}}"""
+    return {
+        currency: {
+            **{source: flows[s, c].item() for s, source in enumerate(SOURCES)},
+            "balance": flows[:, c].sum().item(),
+        }
+        for c, currency in enumerate(economy.currencies)
+    }
+
+
+class Ledger:
+    """One player's signed currency flows by source and currency type"""
+
+    __slots__ = ("economy", "_flows", "_pending", "_category_currency", "_has_box_cost")
+
+    def __init__(self, economy, flows=None):
+        self.economy = economy
+        self._flows = np.zeros((len(SOURCES), len(economy.currencies)), dtype=np.int64)
+        if flows is not None:
+            self._flows[...] = flows
+        # The per-slot scalar path adds into a plain list, folded into the
+        # array whenever flows is read; NumPy element updates cost more than a draw
+        self._pending = [0] * self._flows.size
+        self._category_currency = economy.category_currency.tolist()
+        self._has_box_cost = bool(economy.box_cost.any())
+
+    @property
+    def flows(self):
+        """(sources, currencies) array of signed flows"""
+        if any(self._pending):
+            self._flows += np.array(self._pending, dtype=np.int64).reshape(self._flows.shape)
+            self._pending = [0] * self._flows.size
+        return self._flows
+
+    def earn(self, source, category, amount):
+        """Record amount earned from a drop or refund of a category"""
+        self._pending[source * self._flows.shape[1] + self._category_currency[category]] += amount
+
+    def charge_boxes(self, count=1):
+        if self._has_box_cost:
+            self.flows[BOX_COST] -= count * self.economy.box_cost
+
+    def record_draws(self, categories, item_numbers, is_new, values, refunds):
+        """Record a batch of resolved draws and their box costs"""
+        self._flows += draw_flows(self.economy, categories, item_numbers, is_new, values, refunds)
+
+    def balance(self):
+        """Return the balance of each currency as an array"""
+        return self.flows.sum(axis=0)
+
+    def can_afford(self, cost):
+        """Whether every currency the cost charges is covered; others may be negative"""
+        return bool(((self.balance() >= cost) | (cost == 0)).all())
+
+    def spend(self, sink, cost):
+        """Record spending a per-currency cost array on a sink"""
+        self.flows[sink] -= cost
+
+    def balances(self):
+        return dict(zip(self.economy.currencies, self.balance().tolist()))
+
+    def to_dict(self):
+        return flows_dict(self.economy, self.flows)
+
+
+def craft_affordable(cohort, rows=None):
+    """Craft recipes in config order, repeatedly, for every player who can afford one
+
+    Returns the number of items crafted per recipe.
+    """
+    crafted = {item: 0 for item in cohort.config.economy.recipes}
+    while True:
+        made = 0
+        for item in crafted:
+            count = len(cohort.craft(item, rows))
+            crafted[item] += count
+            made += count
+        if not made:
+            return crafted
+
+
+def simulate_economy(config=None, players=1000, days=90, boxes_per_day=3, seed=None, craft=True,
+                     quantiles=(0.05, 0.5, 0.95)):
+    """Simulate the earn/spend loop of many players over days of play
+
+    Each day every player opens boxes_per_day boxes and then, when craft is
+    set, crafts whatever recipes their balance covers. Returns per-player mean
+    flows for each day by currency and source, totals, the distribution of
+    final balances and crafted items per player.
+    """
+    from lootbox_cohort import LootBoxCohort
+    from lootbox_sim import Aggregate
+
+    if players <= 0 or days <= 0:
+        raise ValueError("players and days must be positive")
+    cohort = LootBoxCohort(players, config, seed=seed)
+    economy = cohort.config.economy
+
+    daily = np.zeros((days, len(SOURCES), len(economy.currencies)), dtype=np.int64)
+    crafted = {item: 0 for item in economy.recipes}
+    for day in range(days):
+        before = cohort.ledger.sum(axis=0)
+        cohort.open_boxes(boxes_per_day)
+        if craft and economy.recipes:
+            for item, count in craft_affordable(cohort).items():
+                crafted[item] += count
+        daily[day] = cohort.ledger.sum(axis=0) - before
+
+    mean_daily = daily / players
+    balances = (np.cumsum(daily.sum(axis=1), axis=0) / players).tolist()
+    mean_daily = mean_daily.tolist()
+    final = cohort.ledger.sum(axis=1)
+    return {
+        "players": players,
+        "days": days,
+        "boxes_per_day": boxes_per_day,
+        "config_hash": cohort.config.content_hash,
+        "currencies": list(economy.currencies),
+        "sources": list(SOURCES),
+        "daily": [
+            {"day": day + 1, **{
+                currency: {**{source: mean_daily[day][s][c] for s, source in enumerate(SOURCES)},
+                           "balance": balances[day][c]}
+                for c, currency in enumerate(economy.currencies)
+            }}
+            for day in range(days)
+        ],
+        "totals": {currency: {source: flows / players for source, flows in values.items()}
+                   for currency, values in flows_dict(economy, daily.sum(axis=0)).items()},
+        "final_balance": {currency: Aggregate().add(final[:, c]).to_dict(quantiles)
+                          for c, currency in enumerate(economy.currencies)},
+        "crafted_per_player": {item: count / players for item, count in crafted.items()},
+    }
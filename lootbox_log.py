@@ -0,0 +1,112 @@
+import json
+import os
+
+import numpy as np
+
+from lootbox_model import EVENT_DTYPE
+
+CHUNK_FILE = "events-{:06d}.npy"
+META_FILE = "meta.json"
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class RewardLogWriter:
+    """Append-only columnar writer for reward event chunks
+
+    Writes a Parquet file (one row group per chunk) when pyarrow is installed,
+    otherwise a directory of NumPy .npy chunks with a meta.json sidecar.
+    Category names are stored alongside so the log can be read back without
+    the config that produced it. Like the Parquet file, an existing npy log at
+    path is replaced: its chunks are deleted before the new log is written.
+    """
+
+    def __init__(self, path, categories, format="auto"):
+        if format == "auto":
+            format = "parquet" if _has_pyarrow() else "npy"
+        if format not in ("parquet", "npy"):
+            raise ValueError(f"Unknown reward log format: {format}")
+        self.path = path
+        self.format = format
+        self.categories = list(categories)
+        self.rows_written = 0
+        self._chunks_written = 0
+        self._parquet_writer = None
+
+        if format == "npy":
+            os.makedirs(path, exist_ok=True)
+            for name in _chunk_files(path):
+                os.remove(os.path.join(path, name))
+            with open(os.path.join(path, META_FILE), "w") as f:
+                json.dump({"categories": self.categories, "dtype": EVENT_DTYPE.descr}, f)
+
+    def write(self, events):
+        """Append one chunk of structured event rows"""
+        if len(events) == 0:
+            return
+        if self.format == "parquet":
+            self._write_parquet(events)
+        else:
+            np.save(os.path.join(self.path, CHUNK_FILE.format(self._chunks_written)), events)
+        self._chunks_written += 1
+        self.rows_written += len(events)
+
+    def _write_parquet(self, events):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_arrays(
+            [pa.array(events[name]) for name in EVENT_DTYPE.names],
+            names=list(EVENT_DTYPE.names),
+        )
+        if self._parquet_writer is None:
+            schema = table.schema.with_metadata({"categories": json.dumps(self.categories)})
+            self._parquet_writer = pq.ParquetWriter(self.path, schema)
+        self._parquet_writer.write_table(table.cast(self._parquet_writer.schema))
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _chunk_files(path):
+    """Names of the event chunk files in an npy log directory, in write order"""
+    return sorted(name for name in os.listdir(path)
+                  if name.startswith("events-") and name.endswith(".npy") and name[7:-4].isdigit())
+
+
+def read_reward_log(path):
+    """Return (categories, iterator over structured event chunks) for a written log"""
+    if os.path.isdir(path):
+        with open(os.path.join(path, META_FILE)) as f:
+            categories = json.load(f)["categories"]
+        chunks = (np.load(os.path.join(path, name)) for name in _chunk_files(path))
+        return categories, chunks
+
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    categories = json.loads(parquet_file.schema_arrow.metadata[b"categories"])
+
+    def chunks():
+        for index in range(parquet_file.num_row_groups):
+            table = parquet_file.read_row_group(index)
+            events = np.empty(table.num_rows, dtype=EVENT_DTYPE)
+            for name in EVENT_DTYPE.names:
+                events[name] = table.column(name).to_numpy()
+            yield events
+
+    return categories, chunks()
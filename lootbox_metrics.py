@@ -0,0 +1,117 @@
+import functools
+import json
+import time
+
+
+def _event_boxes(events):
+    """Number of boxes in an event array (see lootbox_model.EVENT_DTYPE)"""
+    return int(events["box"][-1] - events["box"][0]) + 1 if len(events) else 0
+
+
+# Instrumented LootBox methods: name -> (phase, count of units handled by one call).
+# Counts are derived from the call's arguments or result so batch calls weigh in
+# by the number of draws they process.
+INSTRUMENTED_METHODS = {
+    "open_box": ("boxes", lambda args, result: 1),
+    # Counts come from the result, so keyword calls count the same as positional ones
+    "open_boxes_events": ("boxes", lambda args, result: _event_boxes(result)),
+    "open_drawn_boxes": ("boxes", lambda args, result: _event_boxes(result)),
+    "open_boxes_batch": ("boxes", lambda args, result: result["boxes_opened"]),
+    "get_item_from_slot": ("sampling", lambda args, result: 1),
+    "_draw_categories": ("sampling", lambda args, result: result.size),
+    "get_random_item_number": ("item_number", lambda args, result: 1),
+    "_draw_item_numbers": ("item_number", lambda args, result: result.size),
+    "_resolve_item": ("duplicate_resolution", lambda args, result: 1),
+    "_resolve_new_items": ("duplicate_resolution", lambda args, result: result.size),
+    # Same draws as _resolve_new_items, so only its time is added
+    "_apply_draws": ("duplicate_resolution", lambda args, result: 0),
+    "format_reward": ("formatting", lambda args, result: 1),
+    "_build_events": ("formatting", lambda args, result: len(result)),
+}
+
+
+class Metrics:
+    """Per-phase call counters and timings for an instrumented LootBox
+
+    Phases are boxes (whole open calls), sampling (category draws),
+    item_number (item number draws), duplicate_resolution and formatting.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.phases = {}
+        self.started = time.perf_counter()
+
+    def record(self, phase, seconds, count=1):
+        totals = self.phases.get(phase)
+        if totals is None:
+            totals = self.phases[phase] = [0, 0, 0.0]
+        totals[0] += 1
+        totals[1] += count
+        totals[2] += seconds
+
+    def wrap(self, phase, func, count_fn):
+        """Return func wrapped to record its duration and unit count under phase"""
+        perf_counter = time.perf_counter
+        record = self.record
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            result = func(*args, **kwargs)
+            record(phase, perf_counter() - start, count_fn(args, result))
+            return result
+        return wrapper
+
+    def snapshot(self, slots_per_box=3):
+        """Return the metrics as a plain dict"""
+        phases = {}
+        for phase, (calls, count, seconds) in self.phases.items():
+            phases[phase] = {
+                "calls": calls,
+                "count": count,
+                "seconds": seconds,
+                "per_second": count / seconds if seconds > 0 else 0.0,
+            }
+        boxes = phases.get("boxes", {"count": 0, "seconds": 0.0})
+        draws = boxes["count"] * slots_per_box
+        return {
+            "elapsed_seconds": time.perf_counter() - self.started,
+            "boxes": boxes["count"],
+            "draws": draws,
+            "boxes_per_second": boxes["count"] / boxes["seconds"] if boxes["seconds"] > 0 else 0.0,
+            "draws_per_second": draws / boxes["seconds"] if boxes["seconds"] > 0 else 0.0,
+            "phases": phases,
+        }
+
+
+def to_json(metrics, indent=2):
+    """Serialize a metrics snapshot dict as JSON"""
+    return json.dumps(metrics, indent=indent)
+
+
+def to_prometheus(metrics, prefix="lootbox"):
+    """Render a metrics snapshot dict in the Prometheus text exposition format"""
+    lines = [
+        f"# HELP {prefix}_boxes_total Loot boxes opened while instrumented",
+        f"# TYPE {prefix}_boxes_total counter",
+        f"{prefix}_boxes_total {metrics['boxes']}",
+        f"# HELP {prefix}_draws_total Slot draws made while instrumented",
+        f"# TYPE {prefix}_draws_total counter",
+        f"{prefix}_draws_total {metrics['draws']}",
+        f"# HELP {prefix}_boxes_per_second Boxes opened per second of opening time",
+        f"# TYPE {prefix}_boxes_per_second gauge",
+        f"{prefix}_boxes_per_second {metrics['boxes_per_second']}",
+    ]
+    for name, help_text, key in (
+        ("phase_calls_total", "Instrumented calls per phase", "calls"),
+        ("phase_units_total", "Units (boxes or draws) processed per phase", "count"),
+        ("phase_seconds_total", "Seconds spent per phase", "seconds"),
+    ):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} counter")
+        for phase, values in metrics["phases"].items():
+            lines.append(f'{prefix}_{name}{{phase="{phase}"}} {values[key]}')
+    return "\n".join(lines) + "\n"
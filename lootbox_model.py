@@ -1,164 +1,312 @@
 import random
+from collections import namedtuple
+
+import numpy as np
+
+from lootbox_collection import CollectionBits
+from lootbox_config import resolve_config
+from lootbox_economy import CRAFTING, DROPS, REFUNDS, Ledger
+from lootbox_pity import apply_guarantees, apply_guarantees_to_box, biased_threshold_count, new_item_probability
+from lootbox_sampling import LootTable
+
+# One slot's outcome. category is an index into LootBox.categories, item_number
+# is 0 for currency, and collected_count is the category's count after the draw.
+RewardEvent = namedtuple(
+    "RewardEvent", ["slot", "category", "item_number", "is_new", "currency", "collected_count"]
+)
+
+# Structured-array layout of RewardEvent rows produced by batch opening,
+# with the 1-based box number each row belongs to
+EVENT_DTYPE = np.dtype([
+    ("box", np.int64),
+    ("slot", np.uint8),
+    ("category", np.int16),
+    ("item_number", np.int16),
+    ("is_new", np.bool_),
+    ("currency", np.int32),
+    ("collected_count", np.int16),
+])
+
+# Boxes opened per chunk when streaming events
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def as_reward_event(row):
+    """Convert a structured event row to a RewardEvent"""
+    if isinstance(row, RewardEvent):
+        return row
+    return RewardEvent(*(row[field].item() for field in RewardEvent._fields))
+
 
 class LootBox:
-    def __init__(self):
-        # Define total unique items for each category
+    def __init__(self, config=None, seed=None, metrics=False):
+        # Drop tables come from a validated, immutable compiled config shared by
+        # every instance; config may be a path, raw data, overrides or a CompiledConfig
+        self.config = resolve_config(config)
+        
+        # Collected items are stored as fixed-width bitsets, one bit per item number
         self.unique_items = {
-            "Emote T1": {"total": 23, "collected": set()},
-            "Emote T2": {"total": 10, "collected": set()},
-            "Spawn Plat T1": {"total": 9, "collected": set()},
-            "Spawn Plat T2": {"total": 0, "collected": set()},
-            "Pets T1": {"total": 57, "collected": set()},
-            "Pets T2": {"total": 34, "collected": set()},
-            "Chess Set: T1": {"total": 114, "collected": set()},
-            "Chess Set: T2": {"total": 32, "collected": set()},
-            "Chess Set: T3": {"total": 24, "collected": set()},
+            item_type: {"total": total, "collected": CollectionBits(total)}
+            for item_type, total in self.config.unique_item_totals.items()
         }
         
-        # Configure item properties
-        self.item_properties = {
-            "Currency High": {"value": 100, "collected": 0},
-            "Currency Med": {"value": 50, "collected": 0},
-            "Currency Low": {"value": 20, "collected": 0},
-            "Emote T1": {"duplicate_currency": 20},
-            "Emote T2": {"duplicate_currency": 50},
-            "Spawn Plat T1": {"duplicate_currency": 20},
-            "Spawn Plat T2": {"duplicate_currency": 50},
-            "Pets T1": {"duplicate_currency": 20},
-            "Pets T2": {"duplicate_currency": 50},
-            "Chess Set: T1": {"duplicate_currency": 20},
-            "Chess Set: T2": {"duplicate_currency": 50},
-            "Chess Set: T3": {"duplicate_currency": 100},
-        }
+        # Per-instance copy of item properties; currency items also count drops
+        self.item_properties = {}
+        for item, properties in self.config.item_properties.items():
+            self.item_properties[item] = dict(properties)
+            if item not in self.unique_items:
+                self.item_properties[item]["collected"] = 0
         
-        # Using original drop rates for all slots
-        original_loot_table = {
-            "Currency High": 5.0,
-            "Currency Med": 8.0,
-            "Currency Low": 18.0,
-            "Emote T1": 10.0,
-            "Emote T2": 5.0,
-            "Spawn Plat T1": 5.0,
-            "Spawn Plat T2": 0.0,
-            "Pets T1": 20.0,
-            "Pets T2": 5.0,
-            "Chess Set: T1": 20.0,
-            "Chess Set: T2": 4.0,
-            "Chess Set: T3": 0.0,
-        }
-        
-                # Using original drop rates for all slots
-        slot1_loot_table = {
-            "Emote T1": 14.0,
-            "Emote T2": 7.0,
-            "Spawn Plat T1": 7.0,
-            "Spawn Plat T2": 0.0,
-            "Pets T1": 30.0,
-            "Pets T2": 7.0,
-            "Chess Set: T1": 29.0,
-            "Chess Set: T2": 5.9,
-            "Chess Set: T3": 0.1,
-        }
-
-        slot2_loot_table = {
-            "Emote T1": 14.0,
-            "Emote T2": 7.0,
-            "Spawn Plat T1": 7.0,
-            "Spawn Plat T2": 0.0,
-            "Pets T1": 30.0,
-            "Pets T2": 7.0,
-            "Chess Set: T1": 29.0,
-            "Chess Set: T2": 5.9,
-            "Chess Set: T3": 0.1,
-        }
-
-        slot3_loot_table = {
-            "Currency High": 10.0,
-            "Currency Med": 20.0,
-            "Currency Low": 70.0,
-        }
-
-
-        # Define slot-specific loot tables (all using the same original probabilities for now)
+        # Slot tables start with the config's precompiled alias samplers and
+        # recompile only if they are edited
         self.slot_loot_tables = [
-            slot1_loot_table.copy(),  # Slot 1
-            slot2_loot_table.copy(),  # Slot 2
-            slot3_loot_table.copy()   # Slot 3
+            LootTable.from_compiled(loot_table, sampler)
+            for loot_table, sampler in zip(self.config.slot_loot_tables, self.config.samplers)
         ]
         
-        # Validate each slot's loot table adds up to 100%
-        for i, loot_table in enumerate(self.slot_loot_tables):
-            total_rate = sum(loot_table.values())
-            if abs(total_rate - 100.0) > 0.01:
-                raise ValueError(f"Slot {i+1} drop rates must sum to 100% (current sum: {total_rate}%)")
-        
         self.total_currency = 0
         self.boxes_opened = 0
         self.total_duplicates = 0
 
+        # Signed currency flows by source (drops, refunds, box cost, crafting) and currency type
+        self.ledger = Ledger(self.config.economy)
+
+        # Pity state: consecutive boxes without each guaranteed item, and the
+        # config's new-item bias rules keyed by item name
+        self.pity_counters = {rule.item: 0 for rule in self.config.guarantee_rules}
+        self._bias_rules = {rule.item: rule for rule in self.config.bias_rules.values()}
+
+        # Running collection counters, updated as items are added so stats never rescan
+        self.collected_counts = {item_type: 0 for item_type in self.unique_items}
+        self.total_collected = 0
+        self.total_items = sum(item["total"] for item in self.unique_items.values())
+        self._sorted_item_types = sorted(self.unique_items)
+
+        # Bumped on every state change; caches of derived views compare against it
+        self.state_version = 0
+        self._stats = None
+        self._stats_version = -1
+
+        # Integer ids for every category, used by the vectorized batch engine
+        self.categories = self.config.categories
+        self.category_ids = self.config.category_ids
+
+        # Private random streams: seed may be an int, a SeedSequence or a NumPy
+        # Generator. The scalar path uses a random.Random seeded from the same
+        # stream, so a given seed reproduces every draw bit for bit.
+        self.rng = np.random.default_rng(seed)
+        self._py_random = random.Random(int(self.rng.integers(2**63)))
+
+        # Opt-in instrumentation; when off, no method is wrapped and nothing is timed
+        self.metrics = None
+        if metrics:
+            self.enable_metrics()
+
+    def enable_metrics(self):
+        """Start recording per-phase counters and timings; returns the Metrics object
+
+        Instrumented methods are wrapped on this instance only, so instances
+        without metrics run the unwrapped code.
+        """
+        from lootbox_metrics import INSTRUMENTED_METHODS, Metrics
+
+        if self.metrics is None:
+            self.metrics = Metrics()
+            for name, (phase, count_fn) in INSTRUMENTED_METHODS.items():
+                setattr(self, name, self.metrics.wrap(phase, getattr(self, name), count_fn))
+        return self.metrics
+
+    def disable_metrics(self):
+        """Stop recording and restore the unwrapped methods"""
+        from lootbox_metrics import INSTRUMENTED_METHODS
+
+        if self.metrics is not None:
+            for name in INSTRUMENTED_METHODS:
+                self.__dict__.pop(name, None)
+            self.metrics = None
+
+    def get_metrics(self, format="dict"):
+        """Return recorded metrics as a dict, or as "json" / "prometheus" text
+
+        Returns None when metrics are not enabled.
+        """
+        from lootbox_metrics import to_json, to_prometheus
+
+        if self.metrics is None:
+            return None
+        snapshot = self.metrics.snapshot(slots_per_box=len(self.slot_loot_tables))
+        if format == "json":
+            return to_json(snapshot)
+        if format == "prometheus":
+            return to_prometheus(snapshot)
+        return snapshot
+
+    def to_snapshot(self):
+        """Serialize the full state (collection, counters, RNG streams, config hash) to bytes"""
+        from lootbox_checkpoint import encode_loot_box
+
+        return encode_loot_box(self)
+
+    @classmethod
+    def from_snapshot(cls, data, config=None):
+        """Restore a LootBox from to_snapshot bytes; see lootbox_checkpoint.decode_loot_box"""
+        from lootbox_checkpoint import decode_loot_box
+
+        return decode_loot_box(data, config)
+
+    def spawn_rngs(self, n):
+        """Spawn n independent NumPy generators from this instance's stream for parallel workers"""
+        return self.rng.spawn(n)
+
     def get_random_item_number(self, item_type):
         """Get a random number for a specific item type"""
-        return random.randint(1, self.unique_items[item_type]["total"])
+        total = self.unique_items[item_type]["total"]
+        if self._bias_rules and item_type in self._bias_rules:
+            rule = self._bias_rules[item_type]
+            if self.collected_counts[item_type] >= biased_threshold_count(rule, total):
+                return self._biased_item_number(item_type, rule)
+        return self._py_random.randint(1, total)
+
+    def _biased_item_number(self, item_type, rule):
+        """Draw an item number under a bias rule, choosing directly from the collected or uncollected pool"""
+        total = self.unique_items[item_type]["total"]
+        pool = self.unique_items[item_type]["collected"].pool()
+        if self._py_random.random() < new_item_probability(rule, total - pool.remaining, total):
+            return pool.uncollected_item(self._py_random.randrange(pool.remaining))
+        return pool.collected_item(self._py_random.randrange(total - pool.remaining))
 
     def get_item_from_slot(self, slot_index):
         """Get a random item from the specified slot's loot table"""
+        return self.slot_loot_tables[slot_index].sampler.draw(self._py_random)
+
+    def sample_slot(self, slot_index, n):
+        """Draw n items from the specified slot's loot table as an array of category ids"""
         loot_table = self.slot_loot_tables[slot_index]
-        items = list(loot_table.keys())
-        probabilities = [loot_table[item] / 100 for item in items]
-        
-        return random.choices(items, weights=probabilities, k=1)[0]
+        ids = np.array([self.category_ids[item] for item in loot_table], dtype=np.int32)
+        return ids[loot_table.sample(n, self.rng)]
 
     def open_box(self):
-        """Open a loot box and get rewards from all three slots"""
+        """Open a loot box and get rewards from every slot
+
+        Returns one RewardEvent per slot; format_reward renders one as text.
+        """
         rewards = []
         self.boxes_opened += 1
+        self.state_version += 1
+        self.ledger.charge_boxes()
+
+        # Every slot is drawn before any is resolved so guarantee rules see the whole box
+        items = [self.get_item_from_slot(slot_index) for slot_index in range(len(self.slot_loot_tables))]
+        if self.pity_counters:
+            apply_guarantees_to_box(items, self.config.guarantee_rules, self.pity_counters)
         
-        for slot_index in range(3):
-            item = self.get_item_from_slot(slot_index)
+        for slot_index, item in enumerate(items):
+            category = self.category_ids[item]
             
-            if "Currency" in item:
+            if item not in self.unique_items:
                 currency_amount = self.item_properties[item]["value"]
                 self.total_currency += currency_amount
-                rewards.append(f"Slot {slot_index+1}: {item}: {currency_amount}")
                 self.item_properties[item]["collected"] += 1
+                self.ledger.earn(DROPS, category, currency_amount)
+                rewards.append(RewardEvent(slot_index, category, 0, False, currency_amount, 0))
             else:
                 # Handle unique items (Emotes, Spawn Platforms, Pets, Chess Sets)
                 if self.unique_items[item]["total"] > 0:
                     item_number = self.get_random_item_number(item)
-                    if item_number in self.unique_items[item]["collected"]:
-                        # Duplicate item
-                        self.total_duplicates += 1
-                        duplicate_currency = self.item_properties[item]["duplicate_currency"]
-                        self.total_currency += duplicate_currency
-                        rewards.append(f"Slot {slot_index+1}: {item} #{item_number} (Duplicate: +{duplicate_currency} currency)")
-                    else:
-                        # New item
-                        self.unique_items[item]["collected"].add(item_number)
-                        rewards.append(f"Slot {slot_index+1}: New {item} #{item_number} "
-                                    f"({len(self.unique_items[item]['collected'])}/{self.unique_items[item]['total']})")
+                    rewards.append(self._resolve_item(slot_index, category, item, item_number))
                 else:
                     # This should not happen with proper configuration, but just in case
-                    rewards.append(f"Slot {slot_index+1}: Error: {item} has no items to collect")
+                    rewards.append(RewardEvent(slot_index, category, 0, False, 0, 0))
         
         return rewards
 
+    def _resolve_item(self, slot_index, category, item, item_number):
+        """Record a drawn unique item as new or duplicate and return its reward event"""
+        if item_number in self.unique_items[item]["collected"]:
+            # Duplicate item
+            self.total_duplicates += 1
+            duplicate_currency = self.item_properties[item]["duplicate_currency"]
+            self.total_currency += duplicate_currency
+            self.ledger.earn(REFUNDS, category, duplicate_currency)
+            return RewardEvent(slot_index, category, item_number, False,
+                               duplicate_currency, self.collected_counts[item])
+        
+        # New item
+        self.unique_items[item]["collected"].add(item_number)
+        self.collected_counts[item] += 1
+        self.total_collected += 1
+        return RewardEvent(slot_index, category, item_number, True, 0, self.collected_counts[item])
+
+    def format_reward(self, event):
+        """Render a reward event (RewardEvent or structured row) as display text"""
+        event = as_reward_event(event)
+        item = self.categories[event.category]
+        prefix = f"Slot {event.slot+1}: "
+        if item not in self.unique_items:
+            return f"{prefix}{item}: {event.currency}"
+        if event.item_number == 0:
+            return f"{prefix}Error: {item} has no items to collect"
+        if event.is_new:
+            return (f"{prefix}New {item} #{event.item_number} "
+                    f"({event.collected_count}/{self.unique_items[item]['total']})")
+        return f"{prefix}{item} #{event.item_number} (Duplicate: +{event.currency} currency)"
+
+    def craft(self, item_type, item_number=None):
+        """Spend the config's crafting cost for item_type to collect one uncollected item
+
+        item_number defaults to the lowest-numbered uncollected item. Raises
+        ValueError if the item has no recipe, is already collected, or the
+        ledger cannot cover the cost. Returns the crafted item number.
+        """
+        recipe = self.config.economy.recipes.get(item_type)
+        if recipe is None:
+            raise ValueError(f"{item_type} cannot be crafted")
+        collection = self.unique_items[item_type]["collected"]
+        if item_number is None:
+            uncollected = np.flatnonzero(~collection.as_array()[1:])
+            if uncollected.size == 0:
+                raise ValueError(f"{item_type} collection is already complete")
+            item_number = int(uncollected[0]) + 1
+        elif not 0 < item_number <= collection.total or item_number in collection:
+            raise ValueError(f"{item_type} #{item_number} cannot be crafted")
+        if not self.ledger.can_afford(recipe.cost):
+            raise ValueError(f"Not enough currency to craft {item_type}")
+
+        self.ledger.spend(CRAFTING, recipe.cost)
+        collection.add(item_number)
+        self.collected_counts[item_type] += 1
+        self.total_collected += 1
+        self.state_version += 1
+        return item_number
+
     def get_collection_stats(self):
-        """Return collection statistics for display"""
+        """Return collection statistics for display
+
+        Built from running counters and cached until the next state change, so
+        repeated calls within a rerun are free. Treat the result as read-only.
+        """
+        if self._stats_version == self.state_version:
+            return self._stats
+
         stats = {
             "boxes_opened": self.boxes_opened,
             "total_currency": self.total_currency,
             "total_duplicates": self.total_duplicates,
             "avg_currency": self.total_currency / self.boxes_opened if self.boxes_opened > 0 else 0,
+            "total_collected": self.total_collected,
+            "total_items": self.total_items,
+            "completion_pct": (self.total_collected / self.total_items * 100) if self.total_items > 0 else 0,
             "collection_progress": {},
+            "balances": self.ledger.balances(),
             "currency_collected": {
-                "Currency High": self.item_properties["Currency High"]["collected"],
-                "Currency Med": self.item_properties["Currency Med"]["collected"],
-                "Currency Low": self.item_properties["Currency Low"]["collected"]
+                item: properties["collected"]
+                for item, properties in self.item_properties.items()
+                if item not in self.unique_items
             }
         }
         
-        for item_type in sorted(self.unique_items.keys()):
-            collected = len(self.unique_items[item_type]["collected"])
+        for item_type in self._sorted_item_types:
+            collected = self.collected_counts[item_type]
             total = self.unique_items[item_type]["total"]
             progress = (collected / total) if total > 0 else 0
             stats["collection_progress"][item_type] = {
@@ -166,36 +314,308 @@ class LootBox:
                 "total": total,
                 "progress": progress
             }
-            
+        
+        self._stats = stats
+        self._stats_version = self.state_version
         return stats
 
     def open_multiple_boxes(self, count):
-        """Open multiple boxes and return summary statistics"""
-        all_rewards = []
-        initial_currency = self.total_currency
-        initial_duplicates = self.total_duplicates
-        initial_collected = {
-            item_type: len(self.unique_items[item_type]["collected"]) 
-            for item_type in self.unique_items
-        }
+        """Open multiple boxes and return their reward events and summary statistics
+
+        Events come back as a structured array (EVENT_DTYPE) with one row per slot.
+        """
+        snapshot = self.counter_snapshot()
         
-        for _ in range(count):
-            rewards = self.open_box()
-            all_rewards.extend(rewards)
+        events = self.open_boxes_events(count)
         
-        # Generate summary statistics
-        summary = {
+        summary = self.summary_since(snapshot, count)
+        return events, summary
+
+    def open_boxes_events(self, count):
+        """Open multiple boxes with vectorized draws and return one event row per slot"""
+        if count <= 0:
+            return np.empty(0, dtype=EVENT_DTYPE)
+
+        return self._open_drawn(*self._draw_boxes(count))
+
+    def open_drawn_boxes(self, categories, uniforms):
+        """Open boxes whose slots were drawn elsewhere and return one event row per slot
+
+        categories is a (boxes, slots) array of category ids as drawn from the
+        slot tables, before guarantee rules; uniforms holds one [0, 1) number
+        per slot that picks its item number. This lets a caller draw the boxes
+        of many players in one vectorized step and resolve each player after.
+        """
+        categories = np.array(categories, dtype=np.int32)
+        if len(categories) == 0:
+            return np.empty(0, dtype=EVENT_DTYPE)
+        if self.pity_counters:
+            apply_guarantees(categories, self.config.guarantee_rules, self.pity_counters)
+        return self._open_drawn(categories, self._draw_item_numbers(categories, uniforms))
+
+    def _open_drawn(self, categories, item_numbers):
+        """Resolve and apply drawn boxes, returning their event rows"""
+        first_box = self.boxes_opened + 1
+        initial_counts = np.zeros(len(self.categories), dtype=np.int64)
+        for item_type, collected in self.collected_counts.items():
+            initial_counts[self.category_ids[item_type]] = collected
+
+        is_new = self._resolve_new_items(categories, item_numbers)
+        self._apply_draws(categories, item_numbers, is_new)
+        return self._build_events(first_box, categories, item_numbers, is_new, initial_counts)
+
+    def iter_open_boxes(self, count, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Open count boxes lazily, yielding event arrays of at most chunk_size boxes
+
+        Memory stays flat regardless of count; state is updated chunk by chunk.
+        """
+        remaining = count
+        while remaining > 0:
+            boxes = min(chunk_size, remaining)
+            yield self.open_boxes_events(boxes)
+            remaining -= boxes
+
+    def log_open_boxes(self, count, path, chunk_size=DEFAULT_CHUNK_SIZE, format="auto"):
+        """Open count boxes, streaming every event to a columnar log at path
+
+        Returns the same summary as open_multiple_boxes.
+        """
+        from lootbox_log import RewardLogWriter
+
+        snapshot = self.counter_snapshot()
+
+        with RewardLogWriter(path, self.categories, format=format) as writer:
+            for events in self.iter_open_boxes(count, chunk_size):
+                writer.write(events)
+
+        return self.summary_since(snapshot, count)
+
+    def open_boxes_batch(self, count):
+        """Open multiple boxes with vectorized draws and return summary statistics
+
+        Produces the same summary as open_multiple_boxes without building
+        per-slot reward events.
+        """
+        snapshot = self.counter_snapshot()
+
+        if count > 0:
+            categories, item_numbers = self._draw_boxes(count)
+            is_new = self._resolve_new_items(categories, item_numbers)
+            self._apply_draws(categories, item_numbers, is_new)
+
+        return self.summary_since(snapshot, count)
+
+    def _category_arrays(self):
+        """Return per-category-id arrays of item totals, currency values and duplicate refunds"""
+        totals = np.zeros(len(self.categories), dtype=np.int64)
+        values = np.zeros(len(self.categories), dtype=np.int64)
+        refunds = np.zeros(len(self.categories), dtype=np.int64)
+        for item, category_id in self.category_ids.items():
+            if item in self.unique_items:
+                totals[category_id] = self.unique_items[item]["total"]
+                refunds[category_id] = self.item_properties[item]["duplicate_currency"]
+            else:
+                values[category_id] = self.item_properties[item]["value"]
+        return totals, values, refunds
+
+    def _draw_boxes(self, count):
+        """Draw category ids and item numbers for every slot of count boxes
+
+        Returns two (count, slots) integer arrays. Item number 0 marks draws
+        that have no unique item (currency, or a category with no items).
+        Guarantee rules are applied to the categories before item numbers are drawn.
+        """
+        categories = self._draw_categories(count)
+        if self.pity_counters:
+            apply_guarantees(categories, self.config.guarantee_rules, self.pity_counters)
+        return categories, self._draw_item_numbers(categories)
+
+    def _draw_categories(self, count):
+        """Draw a (count, slots) array of category ids"""
+        num_slots = len(self.slot_loot_tables)
+        categories = np.empty((count, num_slots), dtype=np.int32)
+        for slot_index in range(num_slots):
+            categories[:, slot_index] = self.sample_slot(slot_index, count)
+        return categories
+
+    def _draw_item_numbers(self, categories, uniforms=None):
+        """Draw a uniform item number for every drawn category, 0 where it has no items"""
+        totals, _, _ = self._category_arrays()
+        slot_totals = totals[categories]
+        if uniforms is None:
+            uniforms = self.rng.random(categories.shape)
+        item_numbers = np.floor(uniforms * slot_totals).astype(np.int32) + 1
+        item_numbers[slot_totals == 0] = 0
+        return item_numbers
+
+    def _resolve_new_items(self, categories, item_numbers):
+        """Flag draws that are the first copy of an item not already collected
+
+        Draws are resolved in box order then slot order, matching open_box.
+        Draws that fall under a bias rule get their item numbers redrawn in place.
+        """
+        flat_categories = categories.ravel()
+        flat_numbers = item_numbers.ravel().astype(np.int64)
+        is_new = np.zeros(flat_numbers.shape, dtype=bool)
+
+        unique_draws = np.flatnonzero(flat_numbers > 0)
+        if unique_draws.size == 0:
+            return is_new.reshape(categories.shape)
+
+        # Keep only the first occurrence of each (category, item number) pair
+        stride = max(item["total"] for item in self.unique_items.values()) + 1
+        keys = flat_categories[unique_draws].astype(np.int64) * stride + flat_numbers[unique_draws]
+        _, first = np.unique(keys, return_index=True)
+        first_draws = unique_draws[first]
+
+        # Drop first occurrences of items that were collected before this batch
+        collected = np.zeros((len(self.categories), stride), dtype=bool)
+        for item_type, item in self.unique_items.items():
+            if item["collected"]:
+                collected[self.category_ids[item_type], :item["total"] + 1] = item["collected"].as_array()
+        already = collected[flat_categories[first_draws], flat_numbers[first_draws]]
+        is_new[first_draws[~already]] = True
+
+        for item_type, rule in self._bias_rules.items():
+            self._resolve_biased_draws(item_type, rule, flat_categories, item_numbers.reshape(-1), is_new)
+        return is_new.reshape(categories.shape)
+
+    def _resolve_biased_draws(self, item_type, rule, flat_categories, flat_numbers, flat_new):
+        """Redraw one category's batch draws from the point its bias rule applies
+
+        Draws before the threshold are uniform and keep their vectorized
+        resolution; from there each draw picks directly from the collected or
+        uncollected pool, until the category is complete.
+        """
+        draws = np.flatnonzero(flat_categories == rule.category)
+        total = self.unique_items[item_type]["total"]
+        before = self.collected_counts[item_type] + np.cumsum(flat_new[draws]) - flat_new[draws]
+        biased = np.flatnonzero(before >= biased_threshold_count(rule, total))
+        if biased.size == 0:
+            return
+
+        # Work on a copy of the pool; the collection itself is updated by _apply_draws
+        first = biased[0]
+        pool = self.unique_items[item_type]["collected"].pool().copy()
+        for number in flat_numbers[draws[:first]][flat_new[draws[:first]]].tolist():
+            pool.collect(number)
+
+        remaining = draws[first:]
+        choices = self.rng.random(len(remaining))
+        picks = self.rng.random(len(remaining))
+        for i, draw in enumerate(remaining.tolist()):
+            if pool.remaining == 0:
+                # Complete: the remaining uniform draws are all duplicates
+                flat_new[remaining[i:]] = False
+                break
+            if choices[i] < new_item_probability(rule, total - pool.remaining, total):
+                number = pool.uncollected_item(int(picks[i] * pool.remaining))
+                pool.collect(number)
+                flat_new[draw] = True
+            else:
+                number = pool.collected_item(int(picks[i] * (total - pool.remaining)))
+                flat_new[draw] = False
+            flat_numbers[draw] = number
+
+    def _apply_draws(self, categories, item_numbers, is_new):
+        """Update counters and collections from resolved batch draws"""
+        count = categories.shape[0]
+        counts = np.bincount(categories.ravel(), minlength=len(self.categories))
+        new_counts = np.bincount(categories[is_new], minlength=len(self.categories))
+        duplicate_counts = np.bincount(categories[(item_numbers > 0) & ~is_new], minlength=len(self.categories))
+
+        self.boxes_opened += count
+        self.state_version += 1
+        for item, category_id in self.category_ids.items():
+            if item in self.unique_items:
+                self.total_duplicates += int(duplicate_counts[category_id])
+                self.total_currency += int(duplicate_counts[category_id]) * self.item_properties[item]["duplicate_currency"]
+            else:
+                self.item_properties[item]["collected"] += int(counts[category_id])
+                self.total_currency += int(counts[category_id]) * self.item_properties[item]["value"]
+
+        _, values, refunds = self._category_arrays()
+        self.ledger.record_draws(categories, item_numbers, is_new, values, refunds)
+
+        for item in self.unique_items:
+            added = int(new_counts[self.category_ids[item]])
+            if added:
+                mask = is_new & (categories == self.category_ids[item])
+                self.unique_items[item]["collected"].update(item_numbers[mask])
+                self.collected_counts[item] += added
+                self.total_collected += added
+
+    def _build_events(self, first_box, categories, item_numbers, is_new, initial_counts):
+        """Pack resolved batch draws into a structured event array"""
+        count, num_slots = categories.shape
+        _, values, refunds = self._category_arrays()
+        flat_categories = categories.ravel()
+        flat_numbers = item_numbers.ravel()
+        flat_new = is_new.ravel()
+
+        events = np.empty(categories.size, dtype=EVENT_DTYPE)
+        events["box"] = np.repeat(np.arange(first_box, first_box + count), num_slots)
+        events["slot"] = np.tile(np.arange(num_slots), count)
+        events["category"] = flat_categories
+        events["item_number"] = flat_numbers
+        events["is_new"] = flat_new
+        events["currency"] = np.where(
+            flat_numbers > 0,
+            np.where(flat_new, 0, refunds[flat_categories]),
+            values[flat_categories],
+        )
+
+        # Running collected count per category, in box then slot order
+        collected_count = np.zeros(categories.size, dtype=np.int64)
+        for item_type in self.unique_items:
+            category_id = self.category_ids[item_type]
+            mask = (flat_categories == category_id) & (flat_numbers > 0)
+            collected_count[mask] = initial_counts[category_id] + np.cumsum(flat_new[mask])
+        events["collected_count"] = collected_count
+        return events
+
+    def counter_snapshot(self):
+        """Capture the counters a batch summary is measured against"""
+        return {
+            "currency": self.total_currency,
+            "duplicates": self.total_duplicates,
+            "collected": dict(self.collected_counts),
+        }
+
+    def summary_since(self, snapshot, count):
+        """Generate summary statistics for count boxes opened since snapshot was taken"""
+        currency_gained = self.total_currency - snapshot["currency"]
+        return {
             "boxes_opened": count,
-            "currency_gained": self.total_currency - initial_currency,
-            "new_duplicates": self.total_duplicates - initial_duplicates,
+            "currency_gained": currency_gained,
+            "new_duplicates": self.total_duplicates - snapshot["duplicates"],
             "new_items": {
-                item_type: len(self.unique_items[item_type]["collected"]) - initial_collected[item_type]
+                item_type: self.collected_counts[item_type] - snapshot["collected"][item_type]
                 for item_type in self.unique_items
             },
-            "avg_currency_per_box": (self.total_currency - initial_currency) / count if count > 0 else 0
+            "avg_currency_per_box": currency_gained / count if count > 0 else 0
         }
-        
-        return all_rewards, summary
+
+    def pack_collection(self):
+        """Pack the collected bitsets of every category into bytes"""
+        return b"".join(item["collected"].to_bytes() for item in self.unique_items.values())
+
+    def unpack_collection(self, data):
+        """Restore collected bitsets from bytes produced by pack_collection"""
+        offset = 0
+        for item in self.unique_items.values():
+            width = CollectionBits.byte_width(item["total"])
+            item["collected"] = CollectionBits.from_bytes(item["total"], data[offset:offset + width])
+            offset += width
+        if offset != len(data):
+            raise ValueError(f"Expected {offset} bytes of collection state, got {len(data)}")
+        self.recount_collection()
+
+    def recount_collection(self):
+        """Rebuild running collection counters from the bitsets"""
+        self.collected_counts = {item_type: len(item["collected"]) for item_type, item in self.unique_items.items()}
+        self.total_collected = sum(self.collected_counts.values())
+        self.state_version += 1
 
     def get_slot_drop_rates(self):
         """Return the drop rates for each slot for display"""
@@ -0,0 +1,183 @@
+from collections import namedtuple
+
+import numpy as np
+
+# After `boxes` consecutive boxes without item, the next box contains it. The
+# drop goes to the first slot in `slots` (slot indices whose table can drop the
+# item) whose own draw is not another guaranteed item.
+GuaranteeRule = namedtuple("GuaranteeRule", ["item", "category", "boxes", "slots"])
+
+# Once a category is at least `threshold` complete, each uncollected item is
+# `weight` times as likely to be drawn as each collected one. An infinite
+# weight is the no-duplicates drop mode.
+NewItemBiasRule = namedtuple("NewItemBiasRule", ["item", "category", "threshold", "weight"])
+
+RULE_TYPES = ("guarantee", "new_item_bias", "no_duplicates")
+
+# Config-wide drop modes; "no_duplicates" adds a no_duplicates rule for every
+# unique category without an explicit bias rule
+DROP_MODES = ("uniform", "no_duplicates")
+
+
+def validate_rules(data):
+    """Raise ValueError if the config's pity_rules are malformed"""
+    unique_items = data["unique_items"]
+    drop_mode = data.get("drop_mode", "uniform")
+    if drop_mode not in DROP_MODES:
+        raise ValueError(f"Unknown drop_mode {drop_mode!r} (expected one of {DROP_MODES})")
+    guaranteed = set()
+    for i, rule in enumerate(data.get("pity_rules", [])):
+        label = f"Pity rule {i+1}"
+        rule_type = rule.get("type")
+        item = rule.get("item")
+        if rule_type not in RULE_TYPES:
+            raise ValueError(f"{label} has unknown type {rule_type!r} (expected one of {RULE_TYPES})")
+        if item not in data["item_properties"]:
+            raise ValueError(f"{label} references unknown item: {item}")
+
+        if rule_type == "guarantee":
+            boxes = rule.get("boxes")
+            if not isinstance(boxes, int) or boxes < 1:
+                raise ValueError(f"{label} boxes must be a positive integer (got {boxes!r})")
+            if item in guaranteed:
+                raise ValueError(f"{label} repeats a guarantee for {item}")
+            guaranteed.add(item)
+            slots = _guarantee_slots(data["slot_loot_tables"], item, rule.get("slot"))
+            if not slots:
+                raise ValueError(f"{label}: no slot can drop {item}")
+        else:
+            if unique_items.get(item, 0) == 0:
+                raise ValueError(f"{label}: {item} has no unique items to bias toward")
+            threshold = rule.get("threshold", 0.0)
+            weight = rule.get("weight") if rule_type == "new_item_bias" else float("inf")
+            if not 0.0 <= threshold <= 1.0:
+                raise ValueError(f"{label} threshold must be between 0 and 1 (got {threshold!r})")
+            if not isinstance(weight, (int, float)) or weight < 1:
+                raise ValueError(f"{label} weight must be a number >= 1 (got {weight!r})")
+
+
+def _guarantee_slots(slot_loot_tables, item, slot=None):
+    slots = [i for i, table in enumerate(slot_loot_tables) if table.get(item, 0) > 0]
+    if slot is not None:
+        slots = [i for i in slots if i == slot - 1]
+    return tuple(slots)
+
+
+def compile_rules(data, category_ids):
+    """Return (guarantee rules, {category id: bias rule}) from validated config data"""
+    guarantees = []
+    biases = {}
+    for rule in data.get("pity_rules", []):
+        item = rule["item"]
+        if rule["type"] == "guarantee":
+            slots = _guarantee_slots(data["slot_loot_tables"], item, rule.get("slot"))
+            guarantees.append(GuaranteeRule(item, category_ids[item], rule["boxes"], slots))
+        else:
+            weight = float(rule["weight"]) if rule["type"] == "new_item_bias" else float("inf")
+            biases[category_ids[item]] = NewItemBiasRule(
+                item, category_ids[item], float(rule.get("threshold", 0.0)), weight
+            )
+    if data.get("drop_mode", "uniform") == "no_duplicates":
+        for item, total in data["unique_items"].items():
+            if total > 0 and category_ids[item] not in biases:
+                biases[category_ids[item]] = NewItemBiasRule(item, category_ids[item], 0.0, float("inf"))
+    return tuple(guarantees), biases
+
+
+def biased_threshold_count(rule, total):
+    """Return the collected count at which a bias rule starts applying"""
+    return int(np.ceil(rule.threshold * total - 1e-9))
+
+
+def new_item_probability(rule, collected, total):
+    """Probability that a biased draw yields an uncollected item"""
+    remaining = total - collected
+    if rule.weight == float("inf"):
+        return (remaining > 0) * 1.0
+    return rule.weight * remaining / (rule.weight * remaining + collected)
+
+
+def guarantee_boxes(has_drop, has_free_slot, counter, boxes):
+    """Find which boxes of a batch receive a guaranteed drop
+
+    has_drop flags boxes that drew the item on their own, has_free_slot boxes
+    with a slot the guarantee may replace, and counter is the number of
+    consecutive boxes without the item before the batch. Returns the indices
+    of guaranteed boxes and the counter after the batch.
+    """
+    count = len(has_drop)
+    positions = np.arange(1, count + 1)
+
+    # Without blocked slots, guarantees fall every boxes + 1 boxes after the
+    # last natural drop, counting from a virtual drop just far enough back
+    # that the first box is a pity box if the counter has already run out
+    virtual = -min(counter, boxes)
+    last_drop = np.maximum.accumulate(np.where(has_drop, positions, virtual))
+    since = positions - np.concatenate([[virtual], last_drop[:-1]])
+    forced = np.flatnonzero(~has_drop & (since % (boxes + 1) == 0))
+
+    if not has_free_slot[forced].all():
+        # Rare: a guarantee found no free slot and carries over; walk the batch
+        forced = []
+        for i in range(count):
+            if has_drop[i]:
+                counter = 0
+            elif counter >= boxes and has_free_slot[i]:
+                forced.append(i)
+                counter = 0
+            else:
+                counter += 1
+        return np.array(forced, dtype=np.int64), counter
+
+    if not has_drop.any() and not forced.size:
+        return forced, counter + count
+    last = max(last_drop[-1], forced[-1] + 1 if forced.size else 0)
+    return forced, int(count - last)
+
+
+def apply_guarantees(categories, rules, counters):
+    """Apply guarantee rules in place to a (boxes, slots) array of category ids
+
+    counters maps each rule's item to its boxes-without count and is updated
+    to the state after the batch.
+    """
+    guaranteed_ids = np.array([rule.category for rule in rules])
+    for rule in rules:
+        has_drop = (categories == rule.category).any(axis=1)
+        free = ~np.isin(categories[:, rule.slots], guaranteed_ids)
+        forced, counters[rule.item] = guarantee_boxes(has_drop, free.any(axis=1), counters[rule.item], rule.boxes)
+        if forced.size:
+            slots = np.asarray(rule.slots)[free[forced].argmax(axis=1)]
+            categories[forced, slots] = rule.category
+
+
+def apply_guarantees_to_box(items, rules, counters):
+    """Apply guarantee rules in place to one box's list of drawn items"""
+    guaranteed_items = {rule.item for rule in rules}
+    for rule in rules:
+        if rule.item in items:
+            counters[rule.item] = 0
+            continue
+        if counters[rule.item] >= rule.boxes:
+            free = [slot for slot in rule.slots if items[slot] not in guaranteed_items]
+            if free:
+                items[free[0]] = rule.item
+                counters[rule.item] = 0
+                continue
+        counters[rule.item] += 1
+
+
+def apply_guarantee_step(categories, rules, counters):
+    """Apply guarantee rules in place to one box for many players
+
+    categories is a (players, slots) array of category ids and counters a
+    (players, rules) array of boxes-without counts, updated in place.
+    """
+    guaranteed_ids = np.array([rule.category for rule in rules])
+    for j, rule in enumerate(rules):
+        has_drop = (categories == rule.category).any(axis=1)
+        free = ~np.isin(categories[:, rule.slots], guaranteed_ids)
+        forced = np.flatnonzero(~has_drop & (counters[:, j] >= rule.boxes) & free.any(axis=1))
+        categories[forced, np.asarray(rule.slots)[free[forced].argmax(axis=1)]] = rule.category
+        has_drop[forced] = True
+        counters[:, j] = np.where(has_drop, 0, counters[:, j] + 1)
@@ -0,0 +1,157 @@
+import random
+
+import numpy as np
+
+
+class AliasTable:
+    """Walker/Vose alias table for O(1) weighted draws from a fixed set of items"""
+
+    def __init__(self, items, weights):
+        self.items = list(items)
+        n = len(self.items)
+        if n == 0:
+            raise ValueError("Cannot build an alias table with no items")
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("Alias table weights must sum to a positive value")
+
+        # Scale weights so the average bucket holds exactly 1.0
+        scaled = [w * n / total for w in weights]
+        prob = [0.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+
+        # Whatever is left is 1.0 up to rounding error
+        for i in large + small:
+            prob[i] = 1.0
+
+        self.prob = prob
+        self.alias = alias
+        self._prob_array = np.array(prob, dtype=np.float64)
+        self._alias_array = np.array(alias, dtype=np.int64)
+
+        # Cumulative distribution for stratified draws; pinned to 1.0 from the
+        # last positive weight so rounding never selects a zero-weight item
+        weights = np.fromiter(weights, dtype=np.float64, count=n)
+        cdf = np.cumsum(weights) / total
+        cdf[int(np.flatnonzero(weights > 0)[-1]):] = 1.0
+        self._cdf = cdf
+
+    def __len__(self):
+        return len(self.items)
+
+    def draw_index(self, rng=random):
+        """Draw a single item index using a random.Random-like generator"""
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+    def draw(self, rng=random):
+        """Draw a single item"""
+        return self.items[self.draw_index(rng)]
+
+    def sample(self, n, rng=None):
+        """Draw n item indices at once as an integer array using a NumPy generator"""
+        if rng is None:
+            rng = np.random.default_rng()
+        buckets = rng.integers(0, len(self.prob), size=n)
+        keep = rng.random(n) < self._prob_array[buckets]
+        return np.where(keep, buckets, self._alias_array[buckets])
+
+    def sample_stratified(self, n, rng=None):
+        """Draw n item indices using one uniform from each of n equal strata of [0, 1)
+
+        Every draw on its own has the table's distribution, but each item's
+        count across the n draws is within one of n * probability. Strata are
+        assigned to positions in random order.
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        uniforms = (rng.permutation(n) + rng.random(n)) / n
+        return np.searchsorted(self._cdf, uniforms, side="right")
+
+
+class LootTable(dict):
+    """Drop-rate dict that keeps a compiled alias sampler in step with its contents
+
+    The sampler is built on first use and thrown away whenever the table is
+    mutated, so reads never pay for recompilation. Building it checks that
+    the drop rates still sum to 100%, so an edited table is validated before
+    anything is drawn from it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sampler = None
+
+    @classmethod
+    def from_compiled(cls, table, sampler):
+        """Build a table that starts out with an already compiled sampler"""
+        loot_table = cls(table)
+        loot_table._sampler = sampler
+        return loot_table
+
+    @property
+    def sampler(self):
+        if self._sampler is None:
+            total_rate = sum(self.values())
+            if abs(total_rate - 100.0) > 0.01:
+                raise ValueError(f"Drop rates must sum to 100% (current sum: {total_rate}%)")
+            self._sampler = AliasTable(self.keys(), self.values())
+        return self._sampler
+
+    def sample(self, n, rng=None):
+        """Draw n items at once, returned as indices into the table's keys"""
+        return self.sampler.sample(n, rng)
+
+    def _invalidate(self):
+        self._sampler = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._invalidate()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._invalidate()
+
+    def clear(self):
+        super().clear()
+        self._invalidate()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._invalidate()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._invalidate()
+        return item
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._invalidate()
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._invalidate()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def copy(self):
+        return LootTable(self)
@@ -0,0 +1,428 @@
+"""Local HTTP service in front of the LootBox model
+
+Endpoints (JSON in, JSON out):
+
+    GET    /players/<id>             collection stats
+    POST   /players/<id>/open        open one box; concurrent calls are micro-batched
+    POST   /players/<id>/open_batch  {"boxes": n}, returns the batch summary
+    DELETE /players/<id>             forget a player and delete their snapshot
+    POST   /simulate                 lootbox_sim.simulate arguments, run in a process pool
+    POST   /sweep                    lootbox_sweep.sweep arguments, run in a process pool
+    POST   /analyze                  {"boxes": [...], "percentiles": [...]}, run in a process pool
+    GET    /health                   store, batching and pool counters
+
+Built on the standard library's threading HTTP server so it runs anywhere the
+model does. Start it with `python -m lootbox serve`.
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from lootbox_checkpoint import load_snapshot, save_snapshot
+from lootbox_config import resolve_config
+from lootbox_model import LootBox, as_reward_event
+
+DEFAULT_CAPACITY = 10_000
+# Longest a single-box request waits for others to batch with
+DEFAULT_MAX_DELAY = 0.002
+DEFAULT_MAX_BATCH = 4096
+# Listen backlog; socketserver's default of 5 resets bursts of concurrent connections
+DEFAULT_BACKLOG = 1024
+REQUEST_TIMEOUT = 30.0
+
+PLAYER_ID = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+class _Entry:
+    """A player's LootBox, the lock held while using it and how many requests have it pinned"""
+
+    __slots__ = ("loot_box", "lock", "pins")
+
+    def __init__(self, loot_box):
+        self.loot_box = loot_box
+        self.lock = threading.Lock()
+        self.pins = 0
+
+
+class PlayerStore:
+    """LRU cache of per-player LootBox state, backed by snapshots on disk
+
+    At most capacity players stay in memory. The least recently used are
+    written to snapshot_dir when evicted and reloaded on their next request;
+    without a snapshot_dir evicted players are dropped. Players in use by a
+    request are pinned and never evicted. New players are seeded from
+    (seed, player id) when a seed is given, so runs are reproducible.
+    """
+
+    def __init__(self, config=None, capacity=DEFAULT_CAPACITY, snapshot_dir=None, seed=None):
+        self.config = resolve_config(config)
+        self.capacity = capacity
+        self.snapshot_dir = snapshot_dir
+        self.seed = seed
+        self._players = OrderedDict()
+        # Evicted players whose snapshot is still being written; a request
+        # for one takes it back instead of reading a half-written snapshot
+        self._evicting = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+
+    def _path(self, player_id):
+        return os.path.join(self.snapshot_dir, f"{player_id}.snapshot")
+
+    def _create(self, player_id):
+        if self.snapshot_dir and os.path.exists(self._path(player_id)):
+            self.loads += 1
+            return load_snapshot(self._path(player_id), self.config)
+        seed = None if self.seed is None else [self.seed, zlib.crc32(player_id.encode())]
+        return LootBox(self.config, seed=seed)
+
+    @contextmanager
+    def player(self, player_id):
+        """Pin a player in memory, loading or creating them, and yield their LootBox under its lock"""
+        with self._lock:
+            entry = self._players.get(player_id) or self._evicting.pop(player_id, None)
+            if entry is None:
+                entry = _Entry(self._create(player_id))
+            self._players[player_id] = entry
+            self._players.move_to_end(player_id)
+            entry.pins += 1
+            evicted = self._select_evictions()
+        try:
+            self._save_evicted(evicted)
+            with entry.lock:
+                yield entry.loot_box
+        finally:
+            with self._lock:
+                entry.pins -= 1
+
+    def _select_evictions(self):
+        # Called with _lock held; pinned players are skipped and evicted on a later pass
+        excess = len(self._players) - self.capacity
+        evicted = []
+        for player_id, entry in self._players.items():
+            if len(evicted) >= excess:
+                break
+            if entry.pins == 0:
+                evicted.append((player_id, entry))
+        for player_id, entry in evicted:
+            del self._players[player_id]
+            if self.snapshot_dir:
+                self._evicting[player_id] = entry
+            self.evictions += 1
+        return evicted if self.snapshot_dir else []
+
+    def _save_evicted(self, evicted):
+        # Snapshots are written (and fsynced) outside the store lock
+        for player_id, entry in evicted:
+            with entry.lock:
+                with self._lock:
+                    # Skip players deleted meanwhile; ones taken back are saved anyway, harmlessly
+                    if self._evicting.get(player_id) is not entry and self._players.get(player_id) is not entry:
+                        continue
+                save_snapshot(entry.loot_box, self._path(player_id))
+                with self._lock:
+                    if self._evicting.get(player_id) is entry:
+                        del self._evicting[player_id]
+
+    def remove(self, player_id):
+        with self._lock:
+            entry = self._players.pop(player_id, None) or self._evicting.pop(player_id, None)
+        if entry is None:
+            self._remove_snapshot(player_id)
+            return
+        # Wait for any snapshot being written for this player before deleting it
+        with entry.lock:
+            self._remove_snapshot(player_id)
+
+    def _remove_snapshot(self, player_id):
+        if self.snapshot_dir and os.path.exists(self._path(player_id)):
+            os.remove(self._path(player_id))
+
+    def flush(self):
+        """Write every in-memory player to snapshot_dir"""
+        if not self.snapshot_dir:
+            return
+        with self._lock:
+            entries = list(self._players.items())
+        for player_id, entry in entries:
+            with entry.lock:
+                save_snapshot(entry.loot_box, self._path(player_id))
+
+    def __len__(self):
+        return len(self._players)
+
+
+def _event_dict(loot_box, event):
+    event = as_reward_event(event)
+    return {
+        **event._asdict(),
+        "item": loot_box.categories[event.category],
+        "text": loot_box.format_reward(event),
+    }
+
+
+class OpenBoxBatcher:
+    """Collects concurrent single-box requests and opens them in batches
+
+    A background thread waits up to max_delay after the first queued request
+    for more to arrive, then draws every queued box's slot categories and
+    item-number uniforms in one vectorized step across all players, and
+    resolves each player's boxes against their collection
+    (LootBox.open_drawn_boxes). Batched boxes draw from the batcher's own
+    stream, seeded by seed.
+    """
+
+    def __init__(self, store, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY, seed=None):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.rng = np.random.default_rng(seed)
+        self.requests = 0
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="open-box-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, player_id):
+        """Queue one box for player_id; the Future resolves to that box's reward dicts"""
+        future = Future()
+        self._queue.put((player_id, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)
+                    break
+                batch.append(request)
+            self._open(batch)
+
+    def _draw(self, count):
+        """Draw (count, slots) category ids and item-number uniforms for count boxes"""
+        config = self.store.config
+        categories = np.empty((count, len(config.samplers)), dtype=np.int32)
+        for slot_index, (sampler, slot_category_ids) in enumerate(zip(config.samplers, config.slot_category_ids)):
+            categories[:, slot_index] = slot_category_ids[sampler.sample(count, self.rng)]
+        return categories, self.rng.random(categories.shape)
+
+    def _open(self, batch):
+        self.requests += len(batch)
+        self.batches += 1
+        categories, uniforms = self._draw(len(batch))
+
+        pending = {}
+        for row, (player_id, future) in enumerate(batch):
+            pending.setdefault(player_id, []).append((row, future))
+        for player_id, requests in pending.items():
+            rows = [row for row, _ in requests]
+            try:
+                with self.store.player(player_id) as loot_box:
+                    events = loot_box.open_drawn_boxes(categories[rows], uniforms[rows])
+                    results = [[_event_dict(loot_box, event) for event in box]
+                               for box in events.reshape(len(rows), -1)]
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(requests, results):
+                future.set_result(result)
+
+
+def _simulate_task(config, params):
+    from lootbox_sim import simulate
+
+    result = simulate(config, workers=1, **params)
+    # Mergeable accumulators; the summary statistics are already in the result
+    del result["aggregates"]
+    return result
+
+
+def _sweep_task(config, params):
+    from lootbox_sweep import sweep
+
+    return sweep(config, workers=1, **params)
+
+
+def _analyze_task(config, params):
+    import lootbox_analysis as analysis
+
+    loot_box = LootBox(config)
+    percentiles = params.get("percentiles", analysis.DEFAULT_PERCENTILES)
+    result = {
+        "expected_currency_per_box": analysis.expected_currency_per_box(loot_box),
+        "completion": analysis.completion_report(loot_box, percentiles),
+        "after_boxes": {},
+    }
+    for boxes in params.get("boxes", []):
+        result["after_boxes"][boxes] = {
+            "expected_currency": analysis.expected_currency(loot_box, boxes),
+            "collected": {
+                item: {"mean": histograms["collected"].mean(),
+                       **{q: histograms["collected"].quantile(q) for q in percentiles}}
+                for item, histograms in analysis.collection_distributions(loot_box, boxes).items()
+                if "collected" in histograms
+            },
+        }
+    return result
+
+
+class LootBoxService:
+    """Player store, single-box batcher and simulation pool behind the HTTP handler"""
+
+    def __init__(self, config=None, capacity=DEFAULT_CAPACITY, snapshot_dir=None, seed=None,
+                 workers=None, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY):
+        self.store = PlayerStore(config, capacity, snapshot_dir, seed)
+        self.batcher = OpenBoxBatcher(self.store, max_batch, max_delay, seed)
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    def open_box(self, player_id):
+        return self.batcher.submit(player_id).result(REQUEST_TIMEOUT)
+
+    def open_batch(self, player_id, boxes):
+        if not isinstance(boxes, int) or boxes < 0:
+            raise ValueError("boxes must be a non-negative integer")
+        with self.store.player(player_id) as loot_box:
+            return loot_box.open_boxes_batch(boxes)
+
+    def stats(self, player_id):
+        with self.store.player(player_id) as loot_box:
+            return loot_box.get_collection_stats()
+
+    def run_task(self, task, params):
+        config = params.pop("config", None)
+        config = self.store.config if config is None else resolve_config(config)
+        return self.executor.submit(task, config, params).result()
+
+    def health(self):
+        return {
+            "players_in_memory": len(self.store),
+            "capacity": self.store.capacity,
+            "snapshot_loads": self.store.loads,
+            "evictions": self.store.evictions,
+            "open_requests": self.batcher.requests,
+            "open_batches": self.batcher.batches,
+            "config_hash": self.store.config.content_hash,
+        }
+
+    def close(self):
+        self.batcher.close()
+        self.store.flush()
+        self.executor.shutdown()
+
+
+def _json_default(value):
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def make_handler(service):
+    """Build a request handler class bound to a LootBoxService"""
+    player_route = re.compile(r"^/players/([^/]+)(/open|/open_batch)?$")
+    tasks = {"/simulate": _simulate_task, "/sweep": _sweep_task, "/analyze": _analyze_task}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body, default=_json_default).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length)) if length else {}
+
+        def _dispatch(self, method):
+            try:
+                self._send(200, self._route(method))
+            except LookupError as e:
+                self._send(404, {"error": str(e)})
+            except (ValueError, TypeError) as e:
+                self._send(400, {"error": str(e)})
+
+        def _route(self, method):
+            path = self.path.split("?", 1)[0]
+            if path == "/health" and method == "GET":
+                return service.health()
+            if path in tasks and method == "POST":
+                return service.run_task(tasks[path], self._body())
+
+            match = player_route.match(path)
+            if match is None or not PLAYER_ID.match(match.group(1)):
+                raise LookupError(f"No route for {method} {path}")
+            player_id, action = match.groups()
+            if method == "GET" and action is None:
+                return service.stats(player_id)
+            if method == "DELETE" and action is None:
+                service.store.remove(player_id)
+                return {"deleted": player_id}
+            if method == "POST" and action == "/open":
+                return {"rewards": service.open_box(player_id)}
+            if method == "POST" and action == "/open_batch":
+                return service.open_batch(player_id, self._body().get("boxes", 1))
+            raise LookupError(f"No route for {method} {path}")
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_DELETE(self):
+            self._dispatch("DELETE")
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = DEFAULT_BACKLOG
+
+
+def serve(host="127.0.0.1", port=8000, **service_options):
+    """Run the service until interrupted, then flush every player to snapshots"""
+    service = LootBoxService(**service_options)
+    server = _Server((host, port), make_handler(service))
+    print(f"Serving loot box model on http://{host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
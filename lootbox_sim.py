@@ -0,0 +1,202 @@
+import math
+import os
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lootbox_config import resolve_config
+from lootbox_model import LootBox
+
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+
+# Players are split into fixed-size chunks, each with its own seed stream,
+# so results depend only on the seed and never on the number of workers
+CHUNK_SIZE = 1000
+
+
+def z_score(confidence):
+    """Two-sided standard normal critical value for a confidence level"""
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+class Aggregate:
+    """Mergeable running statistics (mean, variance, exact quantiles) over integer samples"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.values = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def add(self, samples):
+        """Fold an array of samples into the aggregate"""
+        other = Aggregate()
+        samples = np.asarray(samples, dtype=np.int64)
+        if samples.size == 0:
+            return self
+        other.count = int(samples.size)
+        other.mean = float(samples.mean())
+        other.m2 = float(((samples - other.mean) ** 2).sum())
+        other.values, other.counts = np.unique(samples, return_counts=True)
+        return self.merge(other)
+
+    def merge(self, other):
+        """Combine another aggregate into this one in place"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.values, self.counts = other.values.copy(), other.counts.copy()
+            return self
+
+        # Chan et al. parallel variance update
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+        values, inverse = np.unique(np.concatenate([self.values, other.values]), return_inverse=True)
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, other.counts]),
+                                  minlength=len(values)).astype(np.int64)
+        self.values = values
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def value_at_rank(self, rank):
+        """Return the rank-th smallest sample (1-based, clamped to the sample count)"""
+        if self.count == 0:
+            return 0
+        rank = min(max(1, rank), self.count)
+        cumulative = np.cumsum(self.counts)
+        return int(self.values[np.searchsorted(cumulative, rank)])
+
+    def quantile(self, q):
+        """Return the q-quantile (inverse empirical CDF) of the samples seen so far"""
+        return self.value_at_rank(math.ceil(q * self.count))
+
+    def mean_interval(self, confidence=0.95):
+        """Return a normal-approximation confidence interval for the mean"""
+        half_width = z_score(confidence) * math.sqrt(self.variance / self.count) if self.count else 0.0
+        return self.mean - half_width, self.mean + half_width
+
+    def quantile_interval(self, q, confidence=0.95):
+        """Return a distribution-free confidence interval for the q-quantile from order statistics"""
+        spread = z_score(confidence) * math.sqrt(self.count * q * (1 - q))
+        low = self.value_at_rank(math.floor(self.count * q - spread))
+        high = self.value_at_rank(math.ceil(self.count * q + spread))
+        return low, high
+
+    def to_dict(self, quantiles=DEFAULT_QUANTILES):
+        """Return the statistics as a plain dict"""
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "variance": self.variance,
+            "std": math.sqrt(self.variance),
+            "quantiles": {q: self.quantile(q) for q in quantiles},
+        }
+
+
+def make_loot_box(config=None, seed=None):
+    """Build a LootBox from any config form accepted by lootbox_config.resolve_config"""
+    return LootBox(config=config, seed=seed)
+
+
+def _new_aggregates(loot_box):
+    return {
+        "currency": Aggregate(),
+        "duplicates": Aggregate(),
+        "completion": {
+            item_type: Aggregate()
+            for item_type, item in loot_box.unique_items.items()
+            if item["total"] > 0
+        },
+    }
+
+
+def _merge_aggregates(target, source):
+    target["currency"].merge(source["currency"])
+    target["duplicates"].merge(source["duplicates"])
+    for item_type, aggregate in source["completion"].items():
+        target["completion"][item_type].merge(aggregate)
+    return target
+
+
+def _run_chunk(config, players, boxes_per_player, seed_sequence):
+    """Simulate a chunk of independent players and return their aggregates"""
+    rng = np.random.default_rng(seed_sequence)
+    aggregates = _new_aggregates(make_loot_box(config))
+    currency = np.empty(players, dtype=np.int64)
+    duplicates = np.empty(players, dtype=np.int64)
+    completion = {item_type: np.empty(players, dtype=np.int64) for item_type in aggregates["completion"]}
+
+    for player in range(players):
+        loot_box = make_loot_box(config, seed=rng)
+        loot_box.open_boxes_batch(boxes_per_player)
+        currency[player] = loot_box.total_currency
+        duplicates[player] = loot_box.total_duplicates
+        for item_type, collected in completion.items():
+            collected[player] = len(loot_box.unique_items[item_type]["collected"])
+
+    aggregates["currency"].add(currency)
+    aggregates["duplicates"].add(duplicates)
+    for item_type, collected in completion.items():
+        aggregates["completion"][item_type].add(collected)
+    return aggregates
+
+
+def simulate(config=None, players=1000, boxes_per_player=100, workers=None, seed=None,
+             quantiles=DEFAULT_QUANTILES):
+    """Simulate independent players opening boxes and return population statistics
+
+    Players are spread across a process pool. Each chunk of players gets its own
+    stream spawned from seed, so a given seed reproduces the same numbers for any
+    worker count. Returns per-player currency, duplicate and per-category
+    completion statistics.
+    """
+    if players <= 0:
+        raise ValueError("players must be positive")
+
+    # Compile once here; workers receive the canonical source and recompile it once each
+    config = resolve_config(config)
+    chunk_sizes = [min(CHUNK_SIZE, players - start) for start in range(0, players, CHUNK_SIZE)]
+    seed_sequence = np.random.SeedSequence(seed)
+    seeds = seed_sequence.spawn(len(chunk_sizes))
+    args = [(config, size, boxes_per_player, chunk_seed) for size, chunk_seed in zip(chunk_sizes, seeds)]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(args))
+
+    if workers <= 1:
+        results = [_run_chunk(*chunk_args) for chunk_args in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_run_chunk, *zip(*args)))
+
+    aggregates = results[0]
+    for result in results[1:]:
+        _merge_aggregates(aggregates, result)
+
+    return {
+        "players": players,
+        "boxes_per_player": boxes_per_player,
+        "seed": seed_sequence.entropy,
+        "config_hash": config.content_hash,
+        "currency": aggregates["currency"].to_dict(quantiles),
+        "duplicates": aggregates["duplicates"].to_dict(quantiles),
+        "completion": {
+            item_type: {
+                "total": config.unique_item_totals[item_type],
+                **aggregate.to_dict(quantiles),
+            }
+            for item_type, aggregate in aggregates["completion"].items()
+        },
+        "aggregates": aggregates,
+    }
@@ -0,0 +1,318 @@
+import copy
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from lootbox_adaptive import DEFAULT_MAX_BOXES, DEFAULT_MAX_PLAYERS, next_round, relative_precision
+from lootbox_cohort import LootBoxCohort
+from lootbox_config import compile_config, merge_overrides, resolve_config
+from lootbox_sim import CHUNK_SIZE, Aggregate
+
+DEFAULT_COMPLETION_QUANTILES = (0.5, 0.9)
+
+
+def set_path(data, path, value):
+    """Set a value inside raw config data by key path
+
+    Paths into slot_loot_tables, e.g. ("slot_loot_tables", 0, "Pets T1"),
+    rescale the other entries of that table so it still sums to 100%.
+    """
+    if len(path) == 3 and path[0] == "slot_loot_tables":
+        if not 0 <= path[1] < len(data["slot_loot_tables"]):
+            raise ValueError(f"Config has no slot {path[1]+1}")
+        loot_table = data["slot_loot_tables"][path[1]]
+        if path[2] not in loot_table:
+            raise ValueError(f"Slot {path[1]+1} has no drop rate for {path[2]}")
+        others = sum(rate for item, rate in loot_table.items() if item != path[2])
+        if others <= 0:
+            raise ValueError(f"Cannot rebalance slot {path[1]+1} around {path[2]}")
+        scale = (100.0 - value) / others
+        for item in loot_table:
+            loot_table[item] = value if item == path[2] else loot_table[item] * scale
+        return data
+
+    target = data
+    for key in path[:-1]:
+        if not isinstance(target, dict) or key not in target:
+            raise ValueError(f"Unknown config path: {'.'.join(str(key) for key in path)}")
+        target = target[key]
+    target[path[-1]] = value
+    return data
+
+
+def _path_label(path):
+    if path[0] == "slot_loot_tables":
+        return f"slot{path[1]+1}." + ".".join(str(key) for key in path[2:])
+    return ".".join(str(key) for key in path[1:]) or str(path[0])
+
+
+def grid(axes):
+    """Expand {path: [values]} into {name: {path: value}}, one entry per combination"""
+    paths = list(axes)
+    variants = {}
+    for combination in itertools.product(*(axes[path] for path in paths)):
+        name = ", ".join(f"{_path_label(path)}={value}" for path, value in zip(paths, combination))
+        variants[name] = dict(zip(paths, combination))
+    return variants
+
+
+def _compile_variant(base, variant):
+    """Compile a variant given as {path: value} assignments or resolve_config-style overrides"""
+    if variant and all(isinstance(key, tuple) for key in variant):
+        data = copy.deepcopy(base.to_dict())
+        for path, value in variant.items():
+            set_path(data, path, value)
+        return compile_config(data)
+    return compile_config(merge_overrides(base.to_dict(), variant))
+
+
+def _resolve_variants(base, variants):
+    if isinstance(variants, dict):
+        named = list(variants.items())
+    else:
+        named = [(f"variant {i+1}", variant) for i, variant in enumerate(variants)]
+    return [("base", base)] + [(name, _compile_variant(base, variant)) for name, variant in named]
+
+
+def _new_variant_aggregates(config):
+    return {
+        "currency": Aggregate(),
+        "duplicates": Aggregate(),
+        "currency_delta": Aggregate(),
+        "duplicates_delta": Aggregate(),
+        "completion": {
+            item_type: Aggregate()
+            for item_type, total in config.unique_item_totals.items()
+            if total > 0
+        },
+    }
+
+
+def _run_chunk(config, players, boxes_per_player, max_boxes, seed_sequence):
+    """Simulate one chunk of players under one variant as a cohort
+
+    Every variant runs a given chunk from the same seed sequence, so players
+    share random numbers across variants (common random numbers) and
+    differences between variants are paired and far less noisy than
+    independent runs. Returns each player's currency and duplicates after
+    boxes_per_player boxes and, per unique category, the box at which they
+    completed it: players keep opening boxes until every category is complete
+    or max_boxes, and players who never complete one are censored at
+    max_boxes + 1.
+    """
+    cohort = LootBoxCohort(players, config, seed=seed_sequence)
+    item_types = [item_type for item_type, total in config.unique_item_totals.items() if total > 0]
+    category_ids = [config.category_ids[item_type] for item_type in item_types]
+    totals = config.totals[category_ids]
+    completed_at = np.full((players, len(category_ids)), max_boxes + 1, dtype=np.int64)
+
+    box = 0
+    while box < max_boxes:
+        if box < boxes_per_player:
+            cohort.open_boxes(1)
+        else:
+            pending = np.flatnonzero((completed_at > max_boxes).any(axis=1))
+            if pending.size == 0:
+                break
+            cohort.open_boxes(1, rows=pending)
+        box += 1
+        completed = (cohort.collected_counts[:, category_ids] >= totals) & (completed_at > max_boxes)
+        completed_at[completed] = box
+        if box == boxes_per_player:
+            currency = cohort.currency.copy()
+            duplicates = cohort.duplicates.copy()
+    return currency, duplicates, dict(zip(item_types, completed_at.T))
+
+
+def _chunk_aggregates(configs, runs):
+    """Aggregate one chunk's _run_chunk results, base variant first, with paired deltas"""
+    base_currency, base_duplicates, _ = runs[0]
+    results = []
+    for config, (currency, duplicates, completion) in zip(configs, runs):
+        aggregates = _new_variant_aggregates(config)
+        aggregates["currency"].add(currency)
+        aggregates["duplicates"].add(duplicates)
+        aggregates["currency_delta"].add(currency - base_currency)
+        aggregates["duplicates_delta"].add(duplicates - base_duplicates)
+        for item_type, boxes in completion.items():
+            aggregates["completion"][item_type].add(boxes)
+        results.append(aggregates)
+    return results
+
+
+def _merge_variant_aggregates(target, source):
+    for key in ("currency", "duplicates", "currency_delta", "duplicates_delta"):
+        target[key].merge(source[key])
+    for item_type, aggregate in source["completion"].items():
+        target["completion"][item_type].merge(aggregate)
+
+
+def _per_box_estimate(aggregate, boxes_per_player, confidence):
+    low, high = aggregate.mean_interval(confidence)
+    return {
+        "mean": aggregate.mean / boxes_per_player,
+        "low": low / boxes_per_player,
+        "high": high / boxes_per_player,
+    }
+
+
+def _sweep_precision(merged, max_boxes, confidence, completion_quantiles):
+    """Worst relative CI half-width across every variant's metrics
+
+    Deltas are measured against the base variant's level, since a delta near
+    zero has no meaningful relative precision of its own. Completion
+    quantiles censored at max_boxes are ignored.
+    """
+    base = merged[0]
+    worst = 0.0
+    for aggregates in merged:
+        for key in ("currency", "duplicates"):
+            worst = max(worst, relative_precision(aggregates[key].mean, *aggregates[key].mean_interval(confidence)))
+            if aggregates is not base:
+                low, high = aggregates[f"{key}_delta"].mean_interval(confidence)
+                worst = max(worst, relative_precision(base[key].mean, low, high))
+        for aggregate in aggregates["completion"].values():
+            for q in completion_quantiles:
+                value = aggregate.quantile(q)
+                if value <= max_boxes:
+                    worst = max(worst, relative_precision(value, *aggregate.quantile_interval(q, confidence)))
+    return worst
+
+
+def sweep(base_config=None, variants=(), players=1000, boxes_per_player=100, workers=None, seed=None,
+          confidence=0.95, completion_quantiles=DEFAULT_COMPLETION_QUANTILES, target_precision=None,
+          max_players=DEFAULT_MAX_PLAYERS, max_boxes=DEFAULT_MAX_BOXES):
+    """Simulate a base config and its variants in parallel and compare them
+
+    variants is a dict of name -> variant (or a list of variants), where each
+    variant is either {path: value} assignments (see grid) or a dict of
+    overrides as accepted by lootbox_config.resolve_config. All variants are
+    simulated with common random numbers. Returns one result dict per variant,
+    base first, with confidence intervals on every metric and paired deltas
+    against the base.
+
+    Per-box metrics cover boxes_per_player boxes. Completion quantiles follow
+    each player until every category is complete or max_boxes boxes, whichever
+    comes first; quantiles past max_boxes are censored and reported as None.
+    Categories that rarely complete keep players running to max_boxes, which
+    dominates the run time, so lower max_boxes for quick comparisons.
+
+    With target_precision set, players is only the first round: more players
+    are added in growing rounds until every interval's half-width is within
+    target_precision of its estimate (see _sweep_precision), or until
+    max_players.
+    """
+    if players <= 0:
+        raise ValueError("players must be positive")
+    if not 0 < boxes_per_player <= max_boxes:
+        raise ValueError("boxes_per_player must be positive and not exceed max_boxes")
+
+    base = resolve_config(base_config)
+    named = _resolve_variants(base, variants)
+    configs = [config for _, config in named]
+    seed_sequence = np.random.SeedSequence(seed)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    merged = None
+    done = 0
+    more = players
+    worst = None
+    try:
+        while more > 0:
+            chunk_sizes = [min(CHUNK_SIZE, more - start) for start in range(0, more, CHUNK_SIZE)]
+            seeds = seed_sequence.spawn(len(chunk_sizes))
+            # One task per (chunk, variant) pair; variants of a chunk share its seed
+            args = [(config, size, boxes_per_player, max_boxes, chunk_seed)
+                    for size, chunk_seed in zip(chunk_sizes, seeds) for config in configs]
+            if executor is None or len(args) == 1:
+                runs = [_run_chunk(*chunk_args) for chunk_args in args]
+            else:
+                runs = list(executor.map(_run_chunk, *zip(*args)))
+
+            for start in range(0, len(runs), len(configs)):
+                chunk = _chunk_aggregates(configs, runs[start:start + len(configs)])
+                if merged is None:
+                    merged = chunk
+                    continue
+                for target, source in zip(merged, chunk):
+                    _merge_variant_aggregates(target, source)
+            done += more
+
+            if target_precision is None:
+                break
+            worst = _sweep_precision(merged, max_boxes, confidence, completion_quantiles)
+            if worst <= target_precision:
+                break
+            more = next_round(done, worst, target_precision, CHUNK_SIZE, max_players)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    results = []
+    for (name, config), aggregates in zip(named, merged):
+        completion = {}
+        for item_type, aggregate in aggregates["completion"].items():
+            completion[item_type] = {}
+            for q in completion_quantiles:
+                low, high = aggregate.quantile_interval(q, confidence)
+                value = aggregate.quantile(q)
+                # Quantiles past max_boxes are censored and reported as None
+                completion[item_type][q] = {
+                    "value": value if value <= max_boxes else None,
+                    "low": low if low <= max_boxes else None,
+                    "high": high if high <= max_boxes else None,
+                }
+        is_base = not results
+        results.append({
+            "name": name,
+            "config_hash": config.content_hash,
+            "players": done,
+            "boxes_per_player": boxes_per_player,
+            "max_boxes": max_boxes,
+            "seed": seed_sequence.entropy,
+            "converged": None if target_precision is None else worst <= target_precision,
+            "avg_currency_per_box": _per_box_estimate(aggregates["currency"], boxes_per_player, confidence),
+            "duplicates_per_box": _per_box_estimate(aggregates["duplicates"], boxes_per_player, confidence),
+            "currency_delta_per_box": None if is_base else
+                _per_box_estimate(aggregates["currency_delta"], boxes_per_player, confidence),
+            "duplicates_delta_per_box": None if is_base else
+                _per_box_estimate(aggregates["duplicates_delta"], boxes_per_player, confidence),
+            "completion": completion,
+        })
+    return results
+
+
+def comparison_table(results, categories=None):
+    """Flatten sweep results into one row dict per variant"""
+    rows = []
+    for result in results:
+        row = {"variant": result["name"]}
+        for metric in ("avg_currency_per_box", "duplicates_per_box",
+                       "currency_delta_per_box", "duplicates_delta_per_box"):
+            estimate = result[metric]
+            row[metric] = None if estimate is None else round(estimate["mean"], 3)
+            row[f"{metric}_ci"] = None if estimate is None else (round(estimate["low"], 3),
+                                                                 round(estimate["high"], 3))
+        for item_type, quantiles in result["completion"].items():
+            if categories is not None and item_type not in categories:
+                continue
+            for q, estimate in quantiles.items():
+                row[f"{item_type} p{int(q * 100)}"] = estimate["value"]
+        rows.append(row)
+    return rows
+
+
+def format_table(rows):
+    """Render comparison rows as an aligned plain-text table"""
+    if not rows:
+        return ""
+    columns = list(rows[0])
+    cells = [[str(column) for column in columns]]
+    cells += [["-" if row.get(column) is None else str(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(line[i]) for line in cells) for i in range(len(columns))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(line, widths)) for line in cells)
@@ -1,5 +1,16 @@
+import time
+
+import numpy as np
 import streamlit as st
-from lootbox_model import LootBox
+from lootbox_collection import CollectionBits
+from lootbox_model import LootBox, as_reward_event
+
+# Boxes opened per vectorized chunk when batch opening from the UI
+BATCH_CHUNK_SIZE = 10_000
+# Minimum seconds between progress bar updates
+PROGRESS_INTERVAL = 0.1
+# Number of most recent boxes whose rewards are shown
+REWARD_BOXES_SHOWN = 10
 
 def display_controls():
     """Display the control buttons for the lootbox simulator"""
@@ -13,7 +24,7 @@ def display_controls():
         num_boxes = st.number_input(
             "Number of boxes to open:",
             min_value=1,
-            max_value=1000,
+            max_value=10_000_000,
             value=1,
             step=1,
             help="Enter the number of loot boxes you want to open at once"
@@ -24,22 +35,32 @@ def display_controls():
         if st.button("🎁 Open Loot Box(es)", use_container_width=True):
             # Clear previous rewards if any
             st.session_state.last_rewards = []
+            loot_box = st.session_state.loot_box
+            snapshot = loot_box.counter_snapshot()
             
-            # Open the specified number of boxes
+            # Open boxes in vectorized chunks, keeping only the last few boxes' events
+            # and redrawing the progress bar at most every PROGRESS_INTERVAL seconds
             progress_bar = st.progress(0)
-            for i in range(num_boxes):
-                rewards = st.session_state.loot_box.open_box()
-                
-                # Store only the last 10 rewards to avoid UI clutter
-                if i >= num_boxes - 10:
-                    st.session_state.last_rewards.extend(rewards)
-                
-                # Update progress bar
-                progress_bar.progress((i + 1) / num_boxes)
+            tail_rows = REWARD_BOXES_SHOWN * len(loot_box.slot_loot_tables)
+            tail = None
+            opened = 0
+            last_update = time.monotonic()
+            for events in loot_box.iter_open_boxes(num_boxes, chunk_size=BATCH_CHUNK_SIZE):
+                tail = events[-tail_rows:] if tail is None else np.concatenate([tail, events])[-tail_rows:]
+                opened += len(events) // len(loot_box.slot_loot_tables)
+                now = time.monotonic()
+                if now - last_update >= PROGRESS_INTERVAL:
+                    progress_bar.progress(opened / num_boxes)
+                    last_update = now
+            progress_bar.progress(1.0)
+            
+            st.session_state.last_rewards = [as_reward_event(row) for row in tail]
+            st.session_state.batch_summary = loot_box.summary_since(snapshot, num_boxes)
             
             # Add a summary message
             if num_boxes > 1:
-                summary = f"Opened {num_boxes} loot boxes! Showing the last {min(10, num_boxes)} boxes' rewards."
+                summary = (f"Opened {num_boxes:,} loot boxes! "
+                           f"Showing the last {min(REWARD_BOXES_SHOWN, num_boxes)} boxes' rewards.")
                 st.session_state.summary_message = summary
 
     with col3:
@@ -48,8 +69,31 @@ def display_controls():
             st.session_state.loot_box = LootBox()
             st.session_state.last_rewards = None
             st.session_state.summary_message = None
+            st.session_state.pop("batch_summary", None)
             st.rerun()
 
+def display_snapshot_controls():
+    """Display download and restore controls for the session's loot box state"""
+    with st.expander("💾 Save / Restore Progress"):
+        st.download_button(
+            "Download snapshot",
+            data=st.session_state.loot_box.to_snapshot(),
+            file_name="lootbox.snapshot",
+            mime="application/octet-stream",
+            help="Save collection, counters and random state to resume later"
+        )
+        uploaded = st.file_uploader("Restore from snapshot", type=["snapshot"])
+        if uploaded is not None and st.button("Restore", type="secondary"):
+            try:
+                st.session_state.loot_box = LootBox.from_snapshot(uploaded.getvalue())
+            except ValueError as e:
+                st.error(f"Could not restore snapshot: {e}")
+            else:
+                st.session_state.last_rewards = None
+                st.session_state.summary_message = None
+                st.session_state.pop("batch_summary", None)
+                st.rerun()
+
 def display_rewards():
     """Display the latest rewards if they exist"""
     if hasattr(st.session_state, 'summary_message') and st.session_state.summary_message:
@@ -57,36 +101,39 @@ def display_rewards():
         
     if hasattr(st.session_state, 'last_rewards') and st.session_state.last_rewards:
         with st.expander("🎉 Latest Rewards", expanded=True):
-            # Group rewards by type for better organization
+            # Group reward events by type for better organization
             duplicates = []
             new_items = []
             currency = []
             
             for reward in st.session_state.last_rewards:
-                if "Duplicate" in reward:
-                    duplicates.append(reward)
-                elif "New" in reward:
+                if reward.is_new:
                     new_items.append(reward)
+                elif reward.item_number > 0:
+                    duplicates.append(reward)
                 else:
                     currency.append(reward)
             
+            # Only the rows shown are formatted as text
+            format_reward = st.session_state.loot_box.format_reward
+            
             # Display new items first (they're most exciting)
             if new_items:
                 st.markdown("### 🆕 New Items")
                 for item in new_items:
-                    st.success(item)
+                    st.success(format_reward(item))
             
             # Display duplicates
             if duplicates:
                 st.markdown("### 🔄 Duplicates")
                 for item in duplicates:
-                    st.warning(item)
+                    st.warning(format_reward(item))
             
             # Display currency
             if currency:
                 st.markdown("### 💰 Currency")
                 for item in currency:
-                    st.info(item)
+                    st.info(format_reward(item))
 
 def display_inventory_stats(loot_box):
     """Display inventory statistics"""
@@ -130,62 +177,122 @@ def display_currency_status(loot_box):
         total_currency_drops = sum(stats["currency_collected"].values())
         st.metric("Currency Drops", total_currency_drops)
 
+# Category groups shown on the collection tab, in display order
+COLLECTION_GROUPS = {
+    "Emotes": ["Emote T1", "Emote T2"],
+    "Spawn Platforms": ["Spawn Plat T1", "Spawn Plat T2"],
+    "Pets": ["Pets T1", "Pets T2"],
+    "Chess Sets": ["Chess Set: T1", "Chess Set: T2", "Chess Set: T3"]
+}
+
+# Pixel size of one item in the collection grid image
+GRID_CELL_SIZE = 8
+# Grid colors: not collected, collected, no such item
+GRID_PALETTE = np.array([[225, 225, 225], [46, 160, 67], [255, 255, 255]], dtype=np.uint8)
+
+@st.cache_data(show_spinner=False)
+def _drop_rate_sections(slot_tables, unique_totals, currency_values):
+    """Build (title, rows) drop-rate tables; drop rates are static, so this is cached"""
+    unique_totals = dict(unique_totals)
+    currency_values = dict(currency_values)
+    
+    def rows(loot_table):
+        # Sort items by drop rate (descending) and skip items with 0% drop rate
+        sorted_items = sorted(loot_table, key=lambda x: x[1], reverse=True)
+        return [
+            {
+                "Item": item,
+                "Drop Rate": rate,
+                "Details": (f"Unique Items: {unique_totals[item]}" if item in unique_totals
+                            else f"Value: {currency_values[item]}"),
+            }
+            for item, rate in sorted_items
+            if rate != 0
+        ]
+    
+    # If all slots have the same drop rates, show a single simplified table
+    if all(slot_tables[0] == slot for slot in slot_tables[1:]):
+        return [(None, rows(slot_tables[0]))]
+    return [(f"Slot {slot_index+1}", rows(loot_table)) for slot_index, loot_table in enumerate(slot_tables)]
+
 def display_drop_rates(loot_box):
-    """Display drop rates with progress bars"""
+    """Display drop rates as one table per distinct slot"""
     st.divider()
     st.subheader("📊 Drop Rates by Slot")
     
-    slot_drop_rates = loot_box.get_slot_drop_rates()
-    
-    # Check if all slots have the same drop rates
-    all_same = all(slot_drop_rates[0] == slot for slot in slot_drop_rates[1:])
+    slot_tables = tuple(tuple(loot_table.items()) for loot_table in loot_box.get_slot_drop_rates())
+    unique_totals = tuple((item_type, item["total"]) for item_type, item in loot_box.unique_items.items())
+    currency_values = tuple(
+        (item, properties["value"])
+        for item, properties in loot_box.item_properties.items()
+        if item not in loot_box.unique_items
+    )
+    sections = _drop_rate_sections(slot_tables, unique_totals, currency_values)
     
-    if all_same:
-        # If all slots have the same drop rates, show a simplified view
+    if len(sections) == 1:
         st.info("All slots currently have the same drop rates.")
-        
-        # Sort items by drop rate (descending)
-        sorted_items = sorted(slot_drop_rates[0].items(), key=lambda x: x[1], reverse=True)
-        
-        for item, rate in sorted_items:
-            # Skip items with 0% drop rate
-            if rate == 0:
+    
+    column_config = {
+        "Drop Rate": st.column_config.ProgressColumn("Drop Rate", min_value=0, max_value=100, format="%.1f%%")
+    }
+    for title, rows in sections:
+        if title:
+            st.markdown(f"#### {title}")
+        st.dataframe(rows, column_config=column_config, hide_index=True, use_container_width=True)
+
+def display_collection_details(loot_box):
+    """Display per-category collection progress as a single table"""
+    stats = loot_box.get_collection_stats()
+    
+    rows = []
+    for group, item_types in COLLECTION_GROUPS.items():
+        for item_type in item_types:
+            item_stats = stats["collection_progress"].get(item_type)
+            # Skip unknown categories and items with 0 total
+            if item_stats is None or item_stats["total"] == 0:
                 continue
-                
-            st.progress(rate / 100)
-            
-            if item in loot_box.unique_items:
-                total_items = loot_box.unique_items[item]["total"]
-                st.caption(f"{item}: {rate}% (Unique Items: {total_items})")
-            else:
-                # Currency items
-                value = loot_box.item_properties[item]["value"]
-                st.caption(f"{item}: {rate}% (Value: {value})")
-    else:
-        # Show separate drop rates for each slot
-        for slot_index, loot_table in enumerate(slot_drop_rates):
-            st.markdown(f"#### Slot {slot_index+1}")
-            
-            # Sort items by drop rate (descending)
-            sorted_items = sorted(loot_table.items(), key=lambda x: x[1], reverse=True)
-            
-            for item, rate in sorted_items:
-                # Skip items with 0% drop rate
-                if rate == 0:
-                    continue
-                    
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.progress(rate / 100)
-                with col2:
-                    st.write(f"{rate}%")
-                    
-                if item in loot_box.unique_items:
-                    total_items = loot_box.unique_items[item]["total"]
-                    st.caption(f"{item}: {rate}% (Unique Items: {total_items})")
-                else:
-                    # Currency items
-                    value = loot_box.item_properties[item]["value"]
-                    st.caption(f"{item}: {rate}% (Value: {value})")
-            
-            st.divider() 
\ No newline at end of file
+            rows.append({
+                "Group": group,
+                "Category": item_type,
+                "Collected": f"{item_stats['collected']}/{item_stats['total']}",
+                "Progress": item_stats["progress"] * 100,
+            })
+    
+    column_config = {
+        "Progress": st.column_config.ProgressColumn("Progress", min_value=0, max_value=100, format="%.1f%%")
+    }
+    st.dataframe(rows, column_config=column_config, hide_index=True, use_container_width=True)
+
+@st.cache_data(show_spinner=False)
+def _collection_grid(totals, packed_collection):
+    """Render collected bitsets as an RGB image with one row per non-empty category"""
+    shown = [total for _, total in totals if total > 0]
+    grid = np.full((len(shown), max(shown)), 2, dtype=np.uint8)
+    offset = 0
+    row = 0
+    for _, total in totals:
+        byte_width = CollectionBits.byte_width(total)
+        if total > 0:
+            collected = CollectionBits.from_bytes(total, packed_collection[offset:offset + byte_width])
+            grid[row, :total] = collected.as_array()[1:]
+            row += 1
+        offset += byte_width
+    
+    image = GRID_PALETTE[grid]
+    image = np.repeat(np.repeat(image, GRID_CELL_SIZE, axis=0), GRID_CELL_SIZE, axis=1)
+    # White gutters between cells
+    image[GRID_CELL_SIZE - 1::GRID_CELL_SIZE, :] = 255
+    image[:, GRID_CELL_SIZE - 1::GRID_CELL_SIZE] = 255
+    return image
+
+def display_collection_grid(loot_box):
+    """Display every collected item as a single cached image"""
+    if loot_box.total_items == 0:
+        return
+    
+    # The packed bitsets are a few dozen bytes and change exactly when the grid does
+    totals = tuple((item_type, item["total"]) for item_type, item in loot_box.unique_items.items())
+    image = _collection_grid(totals, loot_box.pack_collection())
+    
+    caption = "Rows: " + ", ".join(f"{item_type} ({total})" for item_type, total in totals if total > 0)
+    st.image(image, caption=caption)
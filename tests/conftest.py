@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lootbox_config import resolve_config  # noqa: E402
+
+# Config overrides covering every way an item number can be drawn: uniform,
+# no duplicates, new-item bias and guarantee rules
+DROP_MODES = {
+    "uniform": {},
+    "no_duplicates": {"drop_mode": "no_duplicates"},
+    "new_item_bias": {"pity_rules": [
+        {"type": "new_item_bias", "item": "Pets T1", "threshold": 0.5, "weight": 4},
+        {"type": "new_item_bias", "item": "Emote T1", "threshold": 0.0, "weight": 2},
+    ]},
+    "guarantee": {"pity_rules": [
+        {"type": "guarantee", "item": "Chess Set: T2", "boxes": 5},
+        {"type": "guarantee", "item": "Chess Set: T3", "boxes": 20},
+        {"type": "new_item_bias", "item": "Chess Set: T1", "threshold": 0.25, "weight": 3},
+    ]},
+}
+
+
+@pytest.fixture(params=sorted(DROP_MODES))
+def config(request):
+    return resolve_config(DROP_MODES[request.param])
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from lootbox_checkpoint import load_snapshot, run_checkpointed, save_snapshot
+from lootbox_cohort import LootBoxCohort
+from lootbox_model import LootBox
+
+SEED = 20240517
+
+
+def _open_scalar(loot_box, count):
+    for _ in range(count):
+        loot_box.open_box()
+
+
+@pytest.mark.parametrize("split", [5, 40, 150])
+def test_scalar_resume_matches_uninterrupted_run(config, split):
+    # Continue for fewer boxes than it takes to complete most categories, so a
+    # resumed player drawing different items would still show in the collection
+    uninterrupted = LootBox(config, seed=SEED)
+    _open_scalar(uninterrupted, split + 100)
+
+    interrupted = LootBox(config, seed=SEED)
+    _open_scalar(interrupted, split)
+    resumed = LootBox.from_snapshot(interrupted.to_snapshot())
+    _open_scalar(resumed, 100)
+
+    assert resumed.to_snapshot() == uninterrupted.to_snapshot()
+
+
+def test_batch_resume_matches_uninterrupted_run(config):
+    uninterrupted = LootBox(config, seed=SEED)
+    uninterrupted.open_boxes_batch(40)
+    uninterrupted.open_boxes_batch(100)
+
+    interrupted = LootBox(config, seed=SEED)
+    interrupted.open_boxes_batch(40)
+    resumed = LootBox.from_snapshot(interrupted.to_snapshot())
+    resumed.open_boxes_batch(100)
+
+    assert resumed.to_snapshot() == uninterrupted.to_snapshot()
+
+
+def test_cohort_resume_matches_uninterrupted_run(config):
+    uninterrupted = LootBoxCohort(50, config, seed=SEED)
+    uninterrupted.open_boxes(60)
+
+    interrupted = LootBoxCohort(50, config, seed=SEED)
+    interrupted.open_boxes(25)
+    resumed = LootBoxCohort.from_snapshot(interrupted.to_snapshot())
+    resumed.open_boxes(35)
+
+    for name in ("collected", "collected_counts", "drop_counts", "currency", "duplicates",
+                 "boxes_opened", "pity_counters", "ledger"):
+        np.testing.assert_array_equal(getattr(resumed, name), getattr(uninterrupted, name), err_msg=name)
+
+
+def test_run_checkpointed_resumes_from_last_checkpoint(config, tmp_path):
+    path = tmp_path / "player.snapshot"
+    uninterrupted = run_checkpointed(LootBox(config, seed=SEED), tmp_path / "full.snapshot", 2500, every=1000)
+
+    # A crash after the second checkpoint leaves that checkpoint on disk
+    run_checkpointed(LootBox(config, seed=SEED), path, 2000, every=1000)
+    resumed = run_checkpointed(LootBox(config, seed=SEED), path, 2500, every=1000)
+
+    assert resumed.to_snapshot() == uninterrupted.to_snapshot()
+    assert load_snapshot(path, config).to_snapshot() == uninterrupted.to_snapshot()
+
+
+def test_save_and_load_snapshot_round_trip(config, tmp_path):
+    loot_box = LootBox(config, seed=SEED)
+    loot_box.open_boxes_batch(400)
+    cohort = LootBoxCohort(10, config, seed=SEED)
+    cohort.open_boxes(40)
+
+    save_snapshot(loot_box, tmp_path / "player.snapshot")
+    save_snapshot(cohort, tmp_path / "cohort.snapshot")
+
+    restored = load_snapshot(tmp_path / "player.snapshot")
+    assert restored.get_collection_stats() == loot_box.get_collection_stats()
+    np.testing.assert_array_equal(load_snapshot(tmp_path / "cohort.snapshot").ledger, cohort.ledger)
+
+
+def test_corrupt_snapshots_raise_value_error():
+    loot_box = LootBox(seed=SEED)
+    loot_box.open_boxes_batch(100)
+    data = loot_box.to_snapshot()
+    for size in (0, 10, len(data) // 2, len(data) - 1):
+        with pytest.raises(ValueError):
+            LootBox.from_snapshot(data[:size])
+    with pytest.raises(ValueError):
+        LootBoxCohort.from_snapshot(b"not a snapshot")
+
+
+def test_snapshot_rejects_a_different_config():
+    data = LootBox(seed=SEED).to_snapshot()
+    with pytest.raises(ValueError, match="config"):
+        LootBox.from_snapshot(data, {"drop_mode": "no_duplicates"})
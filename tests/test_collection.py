@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from lootbox_collection import CollectionBits, ItemPool
+
+
+def test_picks_are_ranks_whatever_the_collection_order():
+    collected = [17, 3, 40, 8, 9, 25, 1]
+    forward = ItemPool(40, collected)
+    backward = ItemPool(40)
+    for item_number in reversed(collected):
+        backward.collect(item_number)
+    # Collect and release in between, as the original pool might have
+    backward.collect(30)
+    backward.release(30)
+
+    uncollected = [n for n in range(1, 41) if n not in collected]
+    for pool in (forward, backward):
+        assert [pool.uncollected_item(i) for i in range(pool.remaining)] == uncollected
+        assert [pool.collected_item(i) for i in range(40 - pool.remaining)] == sorted(collected)
+
+
+def test_pool_tracks_random_collect_and_release():
+    rng = random.Random(0)
+    total = 57
+    pool = ItemPool(total)
+    reference = set()
+    for _ in range(2000):
+        item_number = rng.randint(1, total)
+        if rng.random() < 0.6:
+            pool.collect(item_number)
+            reference.add(item_number)
+        else:
+            pool.release(item_number)
+            reference.discard(item_number)
+        assert pool.remaining == total - len(reference)
+    assert [pool.collected_item(i) for i in range(len(reference))] == sorted(reference)
+
+
+@pytest.mark.parametrize("total", [0, 1, 7, 8, 9, 114])
+def test_collection_bits_round_trip(total):
+    bits = CollectionBits(total, range(1, total + 1, 3))
+    restored = CollectionBits.from_bytes(total, bits.to_bytes())
+    assert restored == bits
+    assert list(restored) == list(range(1, total + 1, 3))
@@ -0,0 +1,87 @@
+"""The scalar, batch and cohort engines must agree with each other and with exact analytics"""
+import numpy as np
+import pytest
+
+from conftest import DROP_MODES
+from lootbox_analysis import collection_distribution, expected_currency
+from lootbox_cohort import LootBoxCohort
+from lootbox_model import LootBox
+
+SEED = 7
+BOXES = 40
+
+
+def test_events_and_batch_paths_make_the_same_draws(config):
+    with_events = LootBox(config, seed=SEED)
+    events = with_events.open_boxes_events(500)
+    batch = LootBox(config, seed=SEED)
+    summary = batch.open_boxes_batch(500)
+
+    assert with_events.to_snapshot() == batch.to_snapshot()
+    assert summary["boxes_opened"] == 500
+    assert events["currency"].sum() == batch.total_currency
+
+
+def test_open_drawn_boxes_matches_drawing_internally(config):
+    internal = LootBox(config, seed=SEED)
+    internal.open_boxes_events(300)
+
+    external = LootBox(config, seed=SEED)
+    categories = np.column_stack([external.sample_slot(slot, 300) for slot in range(len(external.slot_loot_tables))])
+    uniforms = external.rng.random(categories.shape)
+    external.open_drawn_boxes(categories, uniforms)
+
+    assert external.to_snapshot() == internal.to_snapshot()
+
+
+def _scalar_players(config, players):
+    rng = np.random.default_rng(SEED)
+    results = []
+    for seed in rng.integers(2**63, size=players):
+        loot_box = LootBox(config, seed=int(seed))
+        for _ in range(BOXES):
+            loot_box.open_box()
+        results.append((loot_box.total_currency, loot_box.collected_counts["Pets T1"]))
+    return np.array(results)
+
+
+def _batch_players(config, players):
+    rng = np.random.default_rng(SEED)
+    results = []
+    for seed in rng.integers(2**63, size=players):
+        loot_box = LootBox(config, seed=int(seed))
+        loot_box.open_boxes_batch(BOXES)
+        results.append((loot_box.total_currency, loot_box.collected_counts["Pets T1"]))
+    return np.array(results)
+
+
+def _cohort_players(config, players):
+    cohort = LootBoxCohort(players, config, seed=SEED)
+    cohort.open_boxes(BOXES)
+    return np.column_stack([cohort.currency, cohort.collected_counts[:, config.category_ids["Pets T1"]]])
+
+
+@pytest.mark.parametrize("mode", ["uniform", "no_duplicates", "new_item_bias"])
+@pytest.mark.parametrize("engine, players", [(_scalar_players, 400), (_batch_players, 400),
+                                             (_cohort_players, 4000)])
+def test_engines_match_exact_expectations(mode, engine, players):
+    loot_box = LootBox(DROP_MODES[mode])
+    expected = (expected_currency(loot_box, BOXES),
+                collection_distribution(loot_box, "Pets T1", BOXES)["collected"].mean())
+
+    samples = engine(loot_box.config, players)
+    means = samples.mean(axis=0)
+    standard_errors = samples.std(axis=0, ddof=1) / np.sqrt(players)
+    assert np.all(np.abs(means - expected) <= 4 * standard_errors), (means, expected)
+
+
+def test_cohort_player_round_trips_through_load_player(config):
+    cohort = LootBoxCohort(5, config, seed=SEED)
+    cohort.open_boxes(30)
+    player = cohort.player(3)
+    assert player.total_currency == cohort.currency[3]
+    assert player.boxes_opened == 30
+
+    player.open_boxes_batch(20)
+    cohort.load_player(3, player)
+    assert cohort.player(3).get_collection_stats() == player.get_collection_stats()
@@ -0,0 +1,38 @@
+import numpy as np
+
+from lootbox_log import RewardLogWriter, read_reward_log
+from lootbox_model import LootBox
+
+SEED = 11
+
+
+def test_npy_log_round_trips_every_event(config, tmp_path):
+    path = str(tmp_path / "events")
+    logged = LootBox(config, seed=SEED)
+    summary = logged.log_open_boxes(2500, path, chunk_size=1000, format="npy")
+
+    expected = np.concatenate(list(LootBox(config, seed=SEED).iter_open_boxes(2500, chunk_size=1000)))
+    categories, chunks = read_reward_log(path)
+    events = np.concatenate(list(chunks))
+
+    assert categories == list(config.categories)
+    np.testing.assert_array_equal(events, expected)
+    assert summary["boxes_opened"] == 2500
+    assert events["currency"].sum() == logged.total_currency
+
+
+def test_npy_log_replaces_an_earlier_log(tmp_path):
+    path = str(tmp_path / "events")
+    LootBox(seed=SEED).log_open_boxes(3000, path, chunk_size=500, format="npy")
+    LootBox(seed=SEED).log_open_boxes(700, path, chunk_size=500, format="npy")
+
+    _, chunks = read_reward_log(path)
+    assert sum(len(chunk) for chunk in chunks) == 700 * len(LootBox().slot_loot_tables)
+
+
+def test_empty_chunks_are_skipped(tmp_path):
+    loot_box = LootBox(seed=SEED)
+    with RewardLogWriter(str(tmp_path / "events"), loot_box.categories, format="npy") as writer:
+        writer.write(loot_box.open_boxes_events(0))
+        writer.write(loot_box.open_boxes_events(10))
+    assert writer.rows_written == 10 * len(loot_box.slot_loot_tables)
@@ -0,0 +1,38 @@
+"""Seeds reproduce results exactly, whatever the worker count, and sweeps pair variants by seed"""
+from lootbox_sim import simulate
+from lootbox_sweep import sweep
+
+VARIANT = {("slot_loot_tables", 0, "Pets T1"): 40.0}
+
+
+def _summary(result):
+    return {key: value for key, value in result.items() if key != "aggregates"}
+
+
+def test_simulate_is_reproducible_across_worker_counts():
+    serial = _summary(simulate(players=1200, boxes_per_player=30, workers=1, seed=3))
+    parallel = _summary(simulate(players=1200, boxes_per_player=30, workers=2, seed=3))
+    assert serial == parallel
+    assert _summary(simulate(players=1200, boxes_per_player=30, workers=1, seed=4)) != serial
+
+
+def test_sweep_is_reproducible_across_worker_counts():
+    kwargs = dict(variants={"more pets": VARIANT}, players=300, boxes_per_player=30, max_boxes=200, seed=5)
+    assert sweep(workers=1, **kwargs) == sweep(workers=2, **kwargs)
+
+
+def test_sweep_base_does_not_depend_on_the_variants():
+    kwargs = dict(players=300, boxes_per_player=30, max_boxes=200, workers=1, seed=5)
+    alone = sweep(**kwargs)[0]
+    with_variant = sweep(variants={"more pets": VARIANT}, **kwargs)[0]
+    assert alone == with_variant
+
+
+def test_sweep_deltas_are_paired():
+    base, variant = sweep(variants={"more pets": VARIANT}, players=400, boxes_per_player=30,
+                          max_boxes=200, workers=1, seed=5)
+    delta = variant["currency_delta_per_box"]
+    # Paired differences are tighter than the spread of either variant on its own
+    assert delta["high"] - delta["low"] < variant["avg_currency_per_box"]["high"] - \
+        variant["avg_currency_per_box"]["low"]
+    assert abs(delta["mean"] - (variant["avg_currency_per_box"]["mean"] - base["avg_currency_per_box"]["mean"])) < 1e-9